@@ -0,0 +1,17 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("like", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="like",
+            index=models.Index(fields=["post", "id"], name="like_like_post_id_95b4a4_idx"),
+        ),
+    ]
@@ -17,5 +17,9 @@ class Like(models.Model):
         null=True,
     )
 
+    class Meta:
+        # Keyset pagination of the likes of a post.
+        indexes = [models.Index(fields=["post", "id"])]
+
     def __str__(self):
         return f"like_{self.id}"
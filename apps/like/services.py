@@ -1,14 +1,18 @@
+from django.db import transaction
+
 from apps.like.models import Like
+from apps.outbox.services import add_event
 from apps.post.models import Post
-from apps.producer import publish
 from apps.user.models import User
 
 
+@transaction.atomic
 def create_like(current_user: User, liked_post: Post) -> None:
     Like.objects.create(owner=current_user, post=liked_post)
-    publish("like_created", liked_post.page.pk)
+    add_event("like_created", liked_post.page_id)
 
 
+@transaction.atomic
 def delete_like(current_user: User, liked_post: Post) -> None:
     Like.objects.filter(owner=current_user, post=liked_post).delete()
-    publish("like_deleted", liked_post.page.pk)
+    add_event("like_deleted", liked_post.page_id)
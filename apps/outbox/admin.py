@@ -0,0 +1,5 @@
+from django.contrib import admin
+
+from apps.outbox.models import OutboxEvent
+
+admin.site.register(OutboxEvent)
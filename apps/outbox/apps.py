@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class OutboxConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.outbox"
+
+    def ready(self):
+        from apps.outbox.services import claim_events, closing_connection, delete_published_events
+        from apps.producer import background_publisher
+
+        background_publisher.set_claimer(closing_connection(claim_events))
+        background_publisher.add_listener(closing_connection(delete_published_events))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from pika.exceptions import AMQPError
+
+from apps.outbox.services import relay_events
+from innotter.settings import OUTBOX_RELAY_BATCH_SIZE, OUTBOX_RELAY_INTERVAL
+
+
+class Command(BaseCommand):
+    help = "Drain the outbox table to RabbitMQ"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=OUTBOX_RELAY_BATCH_SIZE)
+        parser.add_argument("--interval", type=float, default=OUTBOX_RELAY_INTERVAL)
+        parser.add_argument("--once", action="store_true", help="Drain the pending events and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                relayed = relay_events(options["batch_size"])
+            except AMQPError as e:
+                # The batch stays in the table and is retried on the next pass.
+                self.stderr.write(f"Outbox relay failed: {e!r}")
+                relayed = 0
+
+            if relayed == options["batch_size"]:
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
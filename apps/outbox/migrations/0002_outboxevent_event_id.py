@@ -0,0 +1,31 @@
+import uuid
+
+from django.db import migrations, models
+
+
+def set_event_ids(apps, schema_editor):
+    OutboxEvent = apps.get_model("outbox", "OutboxEvent")
+    for event in OutboxEvent.objects.only("pk"):
+        event.event_id = uuid.uuid4()
+        event.save(update_fields=["event_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("outbox", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outboxevent",
+            name="event_id",
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(set_event_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="outboxevent",
+            name="event_id",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
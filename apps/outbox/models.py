@@ -0,0 +1,17 @@
+import uuid
+
+from django.db import models
+
+
+class OutboxEvent(models.Model):
+    """Domain event waiting to be relayed to RabbitMQ, written in the same transaction as the change it describes"""
+
+    event_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    method = models.CharField(max_length=30)
+    body = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set while the in-process background publisher owns the event, the relay skips it until then.
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.method}_{self.id}"
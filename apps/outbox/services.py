@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.outbox.models import OutboxEvent
+from apps.producer import background_publisher, publish_batch
+from innotter.settings import OUTBOX_CLAIM_TTL, OUTBOX_RELAY_BATCH_SIZE, OUTBOX_RELAY_DELAY, RABBITMQ_PUBLISH_MODE
+
+
+def add_event(method: str, body) -> OutboxEvent:
+    event = OutboxEvent.objects.create(method=method, body=body)
+    if RABBITMQ_PUBLISH_MODE == "background":
+        transaction.on_commit(
+            lambda: background_publisher.submit(method, body, event_id=event.event_id.hex, key=event.pk)
+        )
+    return event
+
+
+def unclaimed(now) -> Q:
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+
+
+def claim_events(event_pks: list) -> list:
+    """Claim events for the background publisher, skipping those the relay is sending or another sender owns"""
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(unclaimed(now), pk__in=event_pks)
+            .values_list("pk", flat=True)
+        )
+        OutboxEvent.objects.filter(pk__in=claimed).update(claimed_until=now + timedelta(seconds=OUTBOX_CLAIM_TTL))
+    return claimed
+
+
+def delete_published_events(event_pks: list) -> None:
+    if event_pks:
+        OutboxEvent.objects.filter(pk__in=event_pks).delete()
+
+
+def closing_connection(callback):
+    """Wraps a background publisher callback: its thread gets no request_finished signal to release the connection"""
+
+    def wrapper(event_pks):
+        try:
+            return callback(event_pks)
+        finally:
+            close_old_connections()
+
+    return wrapper
+
+
+def relay_events(batch_size: int = OUTBOX_RELAY_BATCH_SIZE) -> int:
+    """Publish the oldest pending events and delete them once the broker has committed the whole batch"""
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(unclaimed(now), created_at__lte=now - timedelta(seconds=OUTBOX_RELAY_DELAY))
+            .order_by("id")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        publish_batch((event.method, event.body, event.event_id.hex) for event in events)
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+
+    return len(events)
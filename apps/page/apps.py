@@ -4,3 +4,25 @@ from django.apps import AppConfig
 class PageConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.page"
+
+    def ready(self):
+        from django.db.models.signals import m2m_changed, post_save, pre_delete
+
+        from apps.page.models import Page
+        from apps.page.search import (
+            update_page_search_vector,
+            update_tag_search_vectors,
+            update_tagged_page_search_vectors,
+        )
+        from apps.page.services import forget_deleted_user
+        from apps.tag.models import Tag
+        from apps.user.models import User
+
+        post_save.connect(update_page_search_vector, sender=Page, dispatch_uid="update_page_search_vector")
+        post_save.connect(update_tag_search_vectors, sender=Tag, dispatch_uid="update_tag_search_vectors")
+        m2m_changed.connect(
+            update_tagged_page_search_vectors,
+            sender=Page.tags.through,
+            dispatch_uid="update_tagged_page_search_vectors",
+        )
+        pre_delete.connect(forget_deleted_user, sender=User, dispatch_uid="forget_deleted_user")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.page.statistics import iter_page_statistics, write_page_statistics
+from innotter.settings import STATISTICS_REBUILD_CHUNK_SIZE, STATISTICS_REBUILD_WORKERS
+
+
+class Command(BaseCommand):
+    help = "Recount posts, likes and followers of every page and overwrite the statistics table with them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=STATISTICS_REBUILD_CHUNK_SIZE)
+        parser.add_argument("--workers", type=int, default=STATISTICS_REBUILD_WORKERS)
+
+    def handle(self, *args, **options):
+        items = iter_page_statistics(options["chunk_size"])
+        written = write_page_statistics(items, options["workers"])
+        self.stdout.write(f"Rebuilt the statistics of {written} pages")
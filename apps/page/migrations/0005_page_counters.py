@@ -0,0 +1,48 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:40
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_relations(apps, schema_editor):
+    """Fills the new counters of the existing pages in one UPDATE"""
+    Page = apps.get_model("page", "Page")
+    Post = apps.get_model("post", "Post")
+
+    def count(model, **filters):
+        counts = model.objects.filter(**filters).order_by().values(*filters).annotate(count=Count("*"))
+        return Coalesce(Subquery(counts.values("count"), output_field=IntegerField()), 0)
+
+    Page.objects.update(
+        followers_count=count(Page.followers.through, page_id=OuterRef("pk")),
+        follow_requests_count=count(Page.follow_requests.through, page_id=OuterRef("pk")),
+        posts_count=count(Post, page_id=OuterRef("pk")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("page", "0004_alter_page_tags"),
+        ("post", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="follow_requests_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="posts_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_relations, migrations.RunPython.noop),
+    ]
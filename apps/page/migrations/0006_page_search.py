@@ -0,0 +1,64 @@
+# Generated by Django 4.1.13 on 2026-10-18 12:02
+
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+# GIN indexes only exist on Postgres, the SQLite dev databases search without them.
+SEARCH_INDEXES = (
+    ("page_page_search_vector_gin", "USING gin (search_vector)"),
+    ("page_page_name_trgm", "USING gin (name gin_trgm_ops)"),
+    ("page_page_uuid_trgm", "USING gin (uuid gin_trgm_ops)"),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    Page = apps.get_model("page", "Page")
+    Tag = apps.get_model("tag", "Tag")
+    tag_names = (
+        Tag.objects.filter(pages=OuterRef("pk")).order_by().values("pages").annotate(names=StringAgg("name", " "))
+    )
+    Page.objects.update(
+        search_vector=SearchVector("name", weight="A", config="english")
+        + SearchVector(
+            Coalesce(Subquery(tag_names.values("names")), Value(""), output_field=TextField()),
+            weight="B",
+            config="english",
+        )
+        + SearchVector("description", weight="C", config="english")
+    )
+    for name, definition in SEARCH_INDEXES:
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON page_page {definition}")
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tag", "0001_initial"),
+        ("page", "0005_page_counters"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="page",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
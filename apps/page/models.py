@@ -1,5 +1,6 @@
 from datetime import datetime
 
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from pytz import UTC
 
@@ -21,6 +22,14 @@ class Page(models.Model):
     unblock_date = models.DateTimeField(null=True, blank=True)
     is_permanently_blocked = models.BooleanField(default=False)
 
+    # Denormalized sizes of the relations above, shifted by apps.page.services.change_page_counters.
+    followers_count = models.PositiveIntegerField(default=0)
+    follow_requests_count = models.PositiveIntegerField(default=0)
+    posts_count = models.PositiveIntegerField(default=0)
+
+    # Kept up to date by the signal handlers of apps.page.search on Postgres, where it is GIN indexed.
+    search_vector = SearchVectorField(null=True, editable=False)
+
     def is_temporary_blocked(self):
         if not self.unblock_date:
             return True
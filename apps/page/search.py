@@ -0,0 +1,111 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, Exists, F, FloatField, OuterRef, Q, Subquery, TextField, Value, When
+from django.db.models.functions import Cast, Coalesce
+from rest_framework.filters import BaseFilterBackend
+
+from apps.page.models import Page
+from apps.tag.models import Tag
+
+SEARCH_CONFIG = "english"
+
+
+def is_full_text_search_supported() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def page_search_vector() -> SearchVector:
+    """Weighted document of a page: its name, then its tag names, then its description"""
+    tag_names = (
+        Tag.objects.filter(pages=OuterRef("pk"))
+        .order_by()
+        .values("pages")
+        .annotate(names=StringAgg("name", " "))
+        .values("names")
+    )
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(Subquery(tag_names), Value(""), output_field=TextField()), weight="B", config=SEARCH_CONFIG
+        )
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(pages) -> None:
+    """Recomputes the stored search vector of `pages` in one UPDATE, a no-op without Postgres"""
+    if is_full_text_search_supported():
+        pages.update(search_vector=page_search_vector())
+
+
+class PageSearchFilter(BaseFilterBackend):
+    """Searches pages by name, uuid prefix, tags and description and orders them by relevance.
+
+    On Postgres the stored search vector is matched through its GIN index and fuzzy name matches
+    through the trigram one. Other databases fall back to unindexed icontains lookups. The
+    relevance is annotated as `search_rank` so that cursor pagination can page through it.
+    """
+
+    search_param = "search"
+
+    def get_search_terms(self, request) -> str:
+        return request.query_params.get(self.search_param, "").replace("\x00", "").strip()
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        if is_full_text_search_supported():
+            return self._search_postgres(queryset, terms)
+        return self._search_fallback(queryset, terms)
+
+    def get_ordering(self, request, queryset, view):
+        # Actions that never filter, e.g. the followers of a page, are paginated by the paginator's ordering.
+        if "search_rank" in queryset.query.annotations:
+            return ("-search_rank", "-id")
+        return view.paginator.ordering
+
+    @staticmethod
+    def _search_postgres(queryset, terms):
+        query = SearchQuery(terms, config=SEARCH_CONFIG, search_type="websearch")
+        return queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_similar=terms) | Q(uuid__startswith=terms)
+        ).annotate(
+            # Doubles survive the round trip through the pagination cursor, the reals of ts_rank do not.
+            search_rank=Cast(SearchRank(F("search_vector"), query) + TrigramSimilarity("name", terms), FloatField())
+        )
+
+    @staticmethod
+    def _search_fallback(queryset, terms):
+        tags = Tag.objects.filter(pages=OuterRef("pk"), name__icontains=terms)
+        return queryset.filter(
+            Q(name__icontains=terms) | Q(uuid__startswith=terms) | Q(description__icontains=terms) | Exists(tags)
+        ).annotate(
+            search_rank=Case(
+                When(name__iexact=terms, then=1.0),
+                When(Q(name__istartswith=terms) | Q(uuid__startswith=terms), then=0.75),
+                When(name__icontains=terms, then=0.5),
+                When(Exists(tags), then=0.25),
+                default=0.1,
+                output_field=FloatField(),
+            )
+        )
+
+
+def update_page_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {"name", "description"} & set(update_fields):
+        update_search_vectors(Page.objects.filter(pk=instance.pk))
+
+
+def update_tag_search_vectors(sender, instance, **kwargs):
+    update_search_vectors(Page.objects.filter(tags=instance))
+
+
+def update_tagged_page_search_vectors(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        update_search_vectors(Page.objects.filter(pk=instance.pk))
+    elif pk_set:
+        update_search_vectors(Page.objects.filter(pk__in=pk_set))
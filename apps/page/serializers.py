@@ -1,15 +1,17 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 
+from apps.outbox.services import add_event
 from apps.page.models import Page
-from apps.producer import publish
+from apps.page.services import get_followers_preview, page_event_data
 from apps.tag.models import Tag
 from apps.user.models import User
 
 
 class UserPageSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.username")
-    followers = serializers.SlugRelatedField(many=True, read_only=True, slug_field="username")
-    follow_requests = serializers.SlugRelatedField(many=True, read_only=True, slug_field="username")
+    followers = serializers.SerializerMethodField()
     tags = serializers.SlugRelatedField(many=True, slug_field="name", queryset=Tag.objects.all())
     is_private = serializers.BooleanField(required=True)
 
@@ -23,15 +25,27 @@ class UserPageSerializer(serializers.ModelSerializer):
             "tags",
             "owner",
             "followers",
+            "followers_count",
             "image",
             "is_private",
-            "follow_requests",
+            "follow_requests_count",
+            "posts_count",
+        )
+        read_only_fields = (
+            "followers_count",
+            "follow_requests_count",
+            "posts_count",
         )
 
-        extra_kwargs = {
-            "followers": {"read_only": True},
-            "follow_requests": {"read_only": True},
-        }
+    @staticmethod
+    def get_followers(page):
+        return get_followers_preview(page)
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("owner").prefetch_related(
+            Prefetch("tags", queryset=Tag.objects.only("id", "name")),
+        )
 
 
 class AdminOrModerPageSerializer(serializers.ModelSerializer):
@@ -39,7 +53,7 @@ class AdminOrModerPageSerializer(serializers.ModelSerializer):
 
     owner = serializers.ReadOnlyField(source="owner.username")
     tags = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name", allow_null=True)
-    followers = serializers.SlugRelatedField(many=True, read_only=True, slug_field="username", allow_null=True)
+    followers = serializers.SerializerMethodField()
     unblock_date = serializers.DateTimeField(default=None)
 
     class Meta:
@@ -53,6 +67,9 @@ class AdminOrModerPageSerializer(serializers.ModelSerializer):
             "owner",
             "image",
             "followers",
+            "followers_count",
+            "follow_requests_count",
+            "posts_count",
             "is_private",
             "unblock_date",
             "is_permanently_blocked",
@@ -66,9 +83,22 @@ class AdminOrModerPageSerializer(serializers.ModelSerializer):
             "owner",
             "image",
             "followers",
+            "followers_count",
+            "follow_requests_count",
+            "posts_count",
             "is_private",
         )
 
+    @staticmethod
+    def get_followers(page):
+        return get_followers_preview(page)
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("owner").prefetch_related(
+            Prefetch("tags", queryset=Tag.objects.only("id", "name")),
+        )
+
 
 class PageListSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.username")
@@ -87,14 +117,16 @@ class PageListSerializer(serializers.ModelSerializer):
             "is_permanently_blocked",
         )
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("owner")
+
     def create(self, validated_data):
         request = self.context.get("request")
         validated_data["owner"] = request.user
-        page = Page.objects.create(**validated_data)
-        data = PageListSerializer(page).data
-        data["owner"] = request.user.pk
-
-        publish("page_created", data)
+        with transaction.atomic():
+            page = Page.objects.create(**validated_data)
+            add_event("page_created", page_event_data(page))
 
         return page
 
@@ -122,3 +154,15 @@ class FollowerSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("email",)
+
+
+class FollowRequestsSerializer(serializers.Serializer):
+    """Serializer for accepting or denying the follow requests of several users at once"""
+
+    emails = serializers.ListField(child=serializers.EmailField(), required=False, default=list)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, attrs):
+        if not attrs["emails"] and not attrs["ids"]:
+            raise serializers.ValidationError("Pass the emails or the ids of the users.")
+        return attrs
@@ -1,6 +1,9 @@
 from datetime import datetime, timedelta
 
-from django.db.models import Q
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
@@ -10,6 +13,7 @@ from apps.page.models import Page
 from apps.tag.models import Tag
 from apps.user.models import User
 from apps.user.services import generate_file_name, get_presigned_url, is_allowed_file_extension
+from innotter import settings
 
 
 def time_converter(time: list):
@@ -33,7 +37,7 @@ def set_to_private(request, pk):
         owner=user,
     )
     page.is_private = True
-    page.save()
+    page.save(update_fields=["is_private"])
     return True, status.HTTP_200_OK
 
 
@@ -46,10 +50,39 @@ def set_to_public(request, pk):
         owner=user,
     )
     page.is_private = False
-    page.save()
+    page.save(update_fields=["is_private"])
     return True, status.HTTP_200_OK
 
 
+def page_event_data(page: Page) -> dict:
+    """The page fields the statistics service keeps"""
+    return {
+        "id": page.pk,
+        "owner": page.owner_id,
+        "name": page.name,
+        "description": page.description,
+    }
+
+
+def change_page_counters(page_pk: int, **deltas: int) -> None:
+    """Shift the denormalized counters of a page in one UPDATE, e.g. change_page_counters(1, followers_count=-1)"""
+    # Clamped at zero so relations changed outside the services cannot make a counter negative.
+    deltas = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items() if delta}
+    if deltas:
+        Page.objects.filter(pk=page_pk).update(**deltas)
+
+
+def forget_deleted_user(sender, instance, **kwargs):
+    """Takes a user about to be deleted out of the counters of the pages it follows or asked to follow.
+
+    Deleting the user cascades its follower and follow request rows away without going through the services.
+    """
+    Page.objects.filter(followers=instance).update(followers_count=Greatest(F("followers_count") - 1, 0))
+    Page.objects.filter(follow_requests=instance).update(
+        follow_requests_count=Greatest(F("follow_requests_count") - 1, 0)
+    )
+
+
 def get_unblocked_pages() -> Page:
     pages = Page.objects.filter(
         Q(is_permanently_blocked=False) & (Q(unblock_date__isnull=True) | Q(unblock_date__lt=datetime.now())),
@@ -63,6 +96,13 @@ def get_blocked_pages() -> Page:
     ).order_by("id")
 
 
+def get_followers_preview(page: Page) -> list:
+    """Usernames of the first few followers, the full list is served by the paginated followers action"""
+    return list(
+        page.followers.order_by("id").values_list("username", flat=True)[: settings.PAGE_FOLLOWERS_PREVIEW_SIZE]
+    )
+
+
 def get_page_followers(page_pk: int) -> Page:
     return get_object_or_404(Page, pk=page_pk).followers.all().order_by("id")
 
@@ -71,57 +111,112 @@ def get_page_follow_requests(page_pk: int) -> Response:
     return get_object_or_404(Page, pk=page_pk).follow_requests.all().order_by("id")
 
 
-def follow_page(user: User, page_pk: int) -> tuple:
-    page = get_object_or_404(Page, pk=page_pk)
-    is_user_follower = page.followers.filter(id=user.pk).exists()
-    if page.is_private and not is_user_follower:
-        page.follow_requests.add(user)
-        return True, is_user_follower
-    elif not is_user_follower:
-        page.followers.add(user)
-    return False, is_user_follower
+def _insert_page_relation(through, page_pk: int, user_pk: int, unless_follower: bool = False) -> bool:
+    """Adds a (page, user) row to `through` in one INSERT, False if it was already there"""
+    table = connection.ops.quote_name(through._meta.db_table)
+    # As in accept_follow_requests, the WHERE keeps SQLite from reading "ON CONFLICT" as part of the SELECT.
+    sql = f"INSERT INTO {table} (page_id, user_id) SELECT %s, %s WHERE 1 = 1"
+    params = [page_pk, user_pk]
+    if unless_follower:
+        followers_table = connection.ops.quote_name(Page.followers.through._meta.db_table)
+        sql += f" AND NOT EXISTS (SELECT 1 FROM {followers_table} WHERE page_id = %s AND user_id = %s)"
+        params += [page_pk, user_pk]
+    with connection.cursor() as cursor:
+        cursor.execute(sql + " ON CONFLICT DO NOTHING", params)
+        return cursor.rowcount > 0
 
 
-def unfollow_page(user: User, page_pk: int) -> tuple:
-    page = get_object_or_404(Page, pk=page_pk)
-    is_user_follower = page.followers.filter(id=user.pk).exists()
-    page.followers.remove(user)
-    return page.owner.pk, is_user_follower
+def is_follower(user: User, page_pk: int) -> bool:
+    return Page.followers.through.objects.filter(page_id=page_pk, user_id=user.pk).exists()
 
 
+@transaction.atomic
+def follow_page(user: User, page_pk: int) -> tuple:
+    """Follows a public page or requests to follow a private one, returns (is_private, changed)"""
+    page = get_object_or_404(Page, pk=page_pk)
+    if page.is_private:
+        changed = _insert_page_relation(Page.follow_requests.through, page.pk, user.pk, unless_follower=True)
+        change_page_counters(page.pk, follow_requests_count=int(changed))
+    else:
+        changed = _insert_page_relation(Page.followers.through, page.pk, user.pk)
+        change_page_counters(page.pk, followers_count=int(changed))
+    return page.is_private, changed
+
+
+@transaction.atomic
+def unfollow_page(user: User, page_pk: int) -> bool:
+    """Unfollows a page in one DELETE, False if the user was not a follower"""
+    deleted, _ = Page.followers.through.objects.filter(page_id=page_pk, user_id=user.pk).delete()
+    if not deleted:
+        get_object_or_404(Page, pk=page_pk)
+    change_page_counters(page_pk, followers_count=-deleted)
+    return bool(deleted)
+
+
+@transaction.atomic
 def accept_follow_request(follower_email: str, page_pk: int) -> bool:
+    """Makes the user a follower and drops its follow request, False if the user already was a follower"""
     page = get_object_or_404(Page, pk=page_pk)
     potential_follower = get_object_or_404(User, email=follower_email)
-    is_follow_request = page.follow_requests.filter(pk=potential_follower.pk).exists()
-    page.followers.add(potential_follower)
-    page.follow_requests.remove(potential_follower)
-    return is_follow_request
+    added = _insert_page_relation(Page.followers.through, page.pk, potential_follower.pk)
+    removed, _ = Page.follow_requests.through.objects.filter(page_id=page.pk, user_id=potential_follower.pk).delete()
+    change_page_counters(page.pk, followers_count=int(added), follow_requests_count=-removed)
+    return added
 
 
 def deny_follow_request(follower_email: str, page_pk: int) -> None:
     page = get_object_or_404(Page, pk=page_pk)
     potential_follower = get_object_or_404(User, email=follower_email)
+    is_follow_request = page.follow_requests.filter(pk=potential_follower.pk).exists()
     page.follow_requests.remove(potential_follower)
+    change_page_counters(page.pk, follow_requests_count=-int(is_follow_request))
+
+
+def _pending_follow_requests(page_pk: int, emails: list = None, ids: list = None):
+    """The follow request rows of a page, only those of the given users when emails or ids are passed"""
+    follow_requests = Page.follow_requests.through.objects.filter(page_id=page_pk)
+    if emails is not None or ids is not None:
+        follow_requests = follow_requests.filter(Q(user__email__in=emails or ()) | Q(user_id__in=ids or ()))
+    return follow_requests
+
+
+@transaction.atomic
+def accept_follow_requests(page_pk: int, emails: list = None, ids: list = None) -> int:
+    """Moves the follow requests to the followers in one INSERT ... SELECT and one DELETE, returns the new followers"""
+    follow_requests = _pending_follow_requests(page_pk, emails, ids)
+    followers_table = connection.ops.quote_name(Page.followers.through._meta.db_table)
+    try:
+        select_sql, params = follow_requests.values("page_id", "user_id").query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connection.cursor() as cursor:
+        # The WHERE of the SELECT keeps "ON CONFLICT" from being parsed as a join constraint by SQLite.
+        cursor.execute(f"INSERT INTO {followers_table} (page_id, user_id) {select_sql} ON CONFLICT DO NOTHING", params)
+        new_followers_number = cursor.rowcount
+
+    # Only the requests that are followers now, one sent after the INSERT stays pending.
+    accepted_number, _ = follow_requests.filter(
+        user_id__in=Page.followers.through.objects.filter(page_id=page_pk).values("user_id")
+    ).delete()
+    change_page_counters(page_pk, followers_count=new_followers_number, follow_requests_count=-accepted_number)
+    return new_followers_number
+
+
+@transaction.atomic
+def deny_follow_requests(page_pk: int, emails: list = None, ids: list = None) -> int:
+    denied_number, _ = _pending_follow_requests(page_pk, emails, ids).delete()
+    change_page_counters(page_pk, follow_requests_count=-denied_number)
+    return denied_number
 
 
 def accept_all_follow_requests(page_pk: int) -> int:
     page = get_object_or_404(Page, pk=page_pk)
-    follow_requests = page.follow_requests.all()
-    follow_requests_number = 0
-    if follow_requests:
-        for potential_follower in follow_requests:
-            follow_requests_number += 1
-            page.followers.add(potential_follower)
-            page.follow_requests.remove(potential_follower)
-    return follow_requests_number
+    return accept_follow_requests(page.pk)
 
 
 def deny_all_follow_requests(page_pk: int) -> None:
     page = get_object_or_404(Page, pk=page_pk)
-    follow_requests = page.follow_requests.all()
-    if follow_requests:
-        for potential_follower in follow_requests:
-            page.follow_requests.remove(potential_follower)
+    deny_follow_requests(page.pk)
 
 
 def get_page_tags(page_pk: int) -> Tag:
@@ -152,6 +247,6 @@ def upload_image_to_s3(request, pk):
     presigned_url = get_presigned_url(image=image, key=key)
 
     page.image = presigned_url
-    page.save()
+    page.save(update_fields=["image"])
 
     return presigned_url
@@ -0,0 +1,105 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+import boto3
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
+from django.conf import settings
+from django.db.models import Count
+
+from apps.like.models import Like
+from apps.page.models import Page
+from apps.post.models import Post
+
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_WRITE_MAX_ATTEMPTS = 8
+BATCH_WRITE_BACKOFF = 0.05
+
+
+class PageCounts:
+    """Walks a grouped (page id, count) stream ordered by page id in step with the pages"""
+
+    def __init__(self, queryset, page_field: str, chunk_size: int):
+        rows = queryset.values(page_field).annotate(count=Count("pk")).order_by(page_field)
+        self._rows = rows.values_list(page_field, "count").iterator(chunk_size=chunk_size)
+        self._current = next(self._rows, None)
+
+    def get(self, page_id: int) -> int:
+        while self._current is not None and self._current[0] < page_id:
+            self._current = next(self._rows, None)
+        if self._current is not None and self._current[0] == page_id:
+            return self._current[1]
+        return 0
+
+
+def iter_page_statistics(chunk_size: int = settings.STATISTICS_REBUILD_CHUNK_SIZE):
+    """Yields the statistics item of every page, ordered by page id.
+
+    Pages and the grouped post, like and follower counts are read as four streams ordered by page id
+    (server-side cursors on Postgres) and merged on the fly, so memory stays bounded by the chunk size.
+    """
+    pages = Page.objects.order_by("id").values_list("id", "owner_id", "name", "description")
+    posts = PageCounts(Post.objects.all(), "page_id", chunk_size)
+    likes = PageCounts(Like.objects.filter(post__isnull=False), "post__page_id", chunk_size)
+    followers = PageCounts(Page.followers.through.objects.all(), "page_id", chunk_size)
+
+    for page_id, owner_id, name, description in pages.iterator(chunk_size=chunk_size):
+        yield {
+            "page_id": page_id,
+            "user_id": owner_id,
+            "name": name,
+            "description": description,
+            "counters": {
+                "amount_of_posts": posts.get(page_id),
+                "amount_of_likes": likes.get(page_id),
+                "amount_of_followers": followers.get(page_id),
+            },
+        }
+
+
+def write_page_statistics(items, workers: int = settings.STATISTICS_REBUILD_WORKERS) -> int:
+    """Overwrites the statistics table with `items` using parallel BatchWriteItem calls, returns the items written.
+
+    At most two batches per worker are queued at a time, so a lazy `items` is never materialized.
+    """
+    client = boto3.client(
+        "dynamodb",
+        endpoint_url=settings.AWS_URL,
+        region_name=settings.AWS_DEFAULT_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        config=Config(max_pool_connections=workers),
+    )
+    serializer = TypeSerializer()
+    items = iter(items)
+    written = 0
+    pending = set()
+
+    with ThreadPoolExecutor(workers) as executor:
+        while batch := list(islice(items, BATCH_WRITE_MAX_ITEMS)):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written += sum(future.result() for future in done)
+
+            requests = [
+                {"PutRequest": {"Item": {key: serializer.serialize(value) for key, value in item.items()}}}
+                for item in batch
+            ]
+            pending.add(executor.submit(_batch_write, client, requests))
+
+        written += sum(future.result() for future in pending)
+    return written
+
+
+def _batch_write(client, requests: list) -> int:
+    table_name = settings.AWS_DYNAMODB_TABLE_NAME
+    unprocessed = requests
+    for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(BATCH_WRITE_BACKOFF * 2 ** (attempt - 1))
+        response = client.batch_write_item(RequestItems={table_name: unprocessed})
+        unprocessed = response.get("UnprocessedItems", {}).get(table_name)
+        if not unprocessed:
+            return len(requests)
+    raise RuntimeError(f"{len(unprocessed)} statistics items were still unprocessed after retries")
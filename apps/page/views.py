@@ -1,8 +1,8 @@
 from datetime import datetime
 
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
 from rest_framework.mixins import (
     CreateModelMixin,
     DestroyModelMixin,
@@ -14,12 +14,15 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from apps.outbox.services import add_event
 from apps.page.models import Page
 from apps.page.permissions import IsAdminOrModerator, IsBlockedPage, IsPageOwner, IsPrivatePage
+from apps.page.search import PageSearchFilter
 from apps.page.serializers import (
     AdminOrModerPageSerializer,
     FollowerSerializer,
     FollowersListSerializer,
+    FollowRequestsSerializer,
     PageListSerializer,
     PageSetAvatarSerializer,
     UserPageSerializer,
@@ -27,15 +30,19 @@ from apps.page.serializers import (
 from apps.page.services import (
     accept_all_follow_requests,
     accept_follow_request,
+    accept_follow_requests,
     add_tag_to_page,
     deny_all_follow_requests,
     deny_follow_request,
+    deny_follow_requests,
     follow_page,
     get_blocked_pages,
     get_page_follow_requests,
     get_page_followers,
     get_page_tags,
     get_unblocked_pages,
+    is_follower,
+    page_event_data,
     remove_tag_from_page,
     set_to_private,
     set_to_public,
@@ -43,12 +50,13 @@ from apps.page.services import (
     unfollow_page,
     upload_image_to_s3,
 )
-from apps.producer import publish
 from apps.tag.serializers import TagPageSerializer, TagSerializer
-from innotter.basic_mixin import GetPermissionsMixin, GetSerializerMixin
+from innotter.basic_mixin import EagerLoadingMixin, GetPermissionsMixin, GetSerializerMixin, PaginatedActionMixin
 
 
 class PagesListViewSet(
+    EagerLoadingMixin,
+    PaginatedActionMixin,
     GetPermissionsMixin,
     RetrieveModelMixin,
     UpdateModelMixin,
@@ -99,12 +107,7 @@ class PagesListViewSet(
         "user": UserPageSerializer,
     }
 
-    filter_backends = (SearchFilter,)
-    search_fields = (
-        "name",
-        "uuid",
-        "tags__name",
-    )
+    filter_backends = (PageSearchFilter,)
 
     @action(detail=True, methods=("put",))
     def block(self, request, *args, **kwargs):
@@ -119,7 +122,7 @@ class PagesListViewSet(
         else:
             page_model.is_permanently_blocked = True
 
-        page_model.save()
+        page_model.save(update_fields=["unblock_date", "is_permanently_blocked"])
 
         return Response(UserPageSerializer(page_model).data, status=status.HTTP_200_OK)
 
@@ -135,33 +138,29 @@ class PagesListViewSet(
         else:
             page_model.is_permanently_blocked = False
 
-        page_model.save()
+        page_model.save(update_fields=["unblock_date", "is_permanently_blocked"])
 
         return Response(UserPageSerializer(page_model).data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"])
     def blocked(self, request):
-        all_blocked_pages = get_blocked_pages()
-        serializer = self.get_serializer(all_blocked_pages, many=True)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return self.paginated_response(self.eager_load(get_blocked_pages()))
 
     @action(detail=True, methods=["get"])
     def followers(self, request, pk=None):
-        all_page_followers = get_page_followers(page_pk=pk)
-        serializer = self.get_serializer(all_page_followers, many=True)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return self.paginated_response(get_page_followers(page_pk=pk))
 
     @action(detail=True, methods=["post"])
+    @transaction.atomic
     def follow(self, request, pk=None):
-        is_private, is_follower = follow_page(user=request.user, page_pk=pk)
-        if not is_private:
-            if not is_follower:
-                publish("follower_added", pk)
-                return Response(
-                    {"detail": "You have subscribed to the page"},
-                    status=status.HTTP_200_OK,
-                )
-        if is_follower:
+        is_private, changed = follow_page(user=request.user, page_pk=pk)
+        if not is_private and changed:
+            add_event("follower_added", pk)
+            return Response(
+                {"detail": "You have subscribed to the page"},
+                status=status.HTTP_200_OK,
+            )
+        if not changed and (not is_private or is_follower(user=request.user, page_pk=pk)):
             return Response(
                 {"detail": "You are already a follower"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -172,9 +171,10 @@ class PagesListViewSet(
         )
 
     @action(detail=True, methods=["post"])
+    @transaction.atomic
     def unfollow(self, request, pk=None):
-        unfollow_page(user=request.user, page_pk=pk)
-        publish("follower_deleted", pk)
+        if unfollow_page(user=request.user, page_pk=pk):
+            add_event("follower_deleted", pk)
         return Response(
             {"detail": "You have unsubscribed from the page or have already been unsubscribed."},
             status=status.HTTP_200_OK,
@@ -191,8 +191,13 @@ class PagesListViewSet(
             return self.detail_serializer_classes.get(self.request.user.role)
         return self.serializer_classes.get(self.action)
 
+    def get_queryset(self):
+        return self.eager_load(super().get_queryset())
+
 
 class CurrentUserPagesViewSet(
+    EagerLoadingMixin,
+    PaginatedActionMixin,
     GetSerializerMixin,
     GetPermissionsMixin,
     CreateModelMixin,
@@ -246,6 +251,16 @@ class CurrentUserPagesViewSet(
         ),
         "accept_follow_request": (IsAuthenticated, (IsPageOwner | IsAdminOrModerator)),
         "deny_follow_request": (IsAuthenticated, (IsPageOwner | IsAdminOrModerator)),
+        "accept_follow_requests": (
+            IsAuthenticated,
+            IsBlockedPage,
+            (IsPageOwner | IsAdminOrModerator),
+        ),
+        "deny_follow_requests": (
+            IsAuthenticated,
+            IsBlockedPage,
+            (IsPageOwner | IsAdminOrModerator),
+        ),
         "accept_all_follow_requests": (
             IsAuthenticated,
             IsBlockedPage,
@@ -282,6 +297,8 @@ class CurrentUserPagesViewSet(
         "followers": FollowersListSerializer,
         "deny_follow_request": FollowerSerializer,
         "accept_follow_request": FollowerSerializer,
+        "accept_follow_requests": FollowRequestsSerializer,
+        "deny_follow_requests": FollowRequestsSerializer,
         "tags": TagSerializer,
         "add_tag_to_page": TagPageSerializer,
         "remove_tag_from_page": TagPageSerializer,
@@ -290,37 +307,34 @@ class CurrentUserPagesViewSet(
         "set_avatar": PageSetAvatarSerializer,
     }
 
-    def update(self, request, *args, **kwargs):
-        response = super().update(request, *args, **kwargs)
-        publish("page_updated", response.data)
-        return response
+    @transaction.atomic
+    def perform_update(self, serializer):
+        page = serializer.save()
+        add_event("page_updated", page_event_data(page))
 
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         pk = kwargs.get("pk")
         response = super().destroy(request, *args, **kwargs)
-        publish("page_deleted", pk)
+        add_event("page_deleted", pk)
         return response
 
     @action(detail=True, methods=["get"])
     def followers(self, request, pk=None):
-        all_page_followers = get_page_followers(page_pk=pk)
-        serializer = self.get_serializer(all_page_followers, many=True)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return self.paginated_response(get_page_followers(page_pk=pk))
 
     @action(detail=True, methods=["get"], url_path="follow-requests")
     def page_follow_requests(self, request, pk=None):
-        page_follow_requests = get_page_follow_requests(page_pk=pk)
-        print(page_follow_requests)
-        serializer = self.get_serializer(page_follow_requests, many=True)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return self.paginated_response(get_page_follow_requests(page_pk=pk))
 
     @action(detail=True, methods=["post"], url_path="accept-follower")
+    @transaction.atomic
     def accept_follow_request(self, request, pk=None):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data["email"]
-        accept_follow_request(follower_email=email, page_pk=pk)
-        publish("follower_added", pk)
+        if accept_follow_request(follower_email=email, page_pk=pk):
+            add_event("follower_added", pk)
         return Response(
             {"detail": "You have successfully accepted user to followers or user is already your follower."},
             status=status.HTTP_200_OK,
@@ -337,10 +351,37 @@ class CurrentUserPagesViewSet(
             status=status.HTTP_200_OK,
         )
 
+    @action(detail=True, methods=["post"], url_path="accept-followers")
+    @transaction.atomic
+    def accept_follow_requests(self, request, pk=None):
+        page = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_followers_number = accept_follow_requests(page_pk=page.pk, **serializer.validated_data)
+        if new_followers_number:
+            add_event("follower_added_all", {"page_id": page.pk, "quantity": new_followers_number})
+        return Response(
+            {"detail": f"You have accepted {new_followers_number} new followers."},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["post"], url_path="deny-followers")
+    def deny_follow_requests(self, request, pk=None):
+        page = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        denied_number = deny_follow_requests(page_pk=page.pk, **serializer.validated_data)
+        return Response(
+            {"detail": f"You have denied {denied_number} follow requests."},
+            status=status.HTTP_200_OK,
+        )
+
     @action(detail=True, methods=["post"], url_path="accept-all")
+    @transaction.atomic
     def accept_all_follow_requests(self, request, pk=None):
-        follow_requests_number = accept_all_follow_requests(page_pk=pk)
-        publish("follower_added_all", {"page_id": pk, "quantity": follow_requests_number})
+        new_followers_number = accept_all_follow_requests(page_pk=pk)
+        if new_followers_number:
+            add_event("follower_added_all", {"page_id": pk, "quantity": new_followers_number})
         return Response(
             {"detail": "You have successfully accepted all follow requests."},
             status=status.HTTP_200_OK,
@@ -356,9 +397,7 @@ class CurrentUserPagesViewSet(
 
     @action(detail=True, methods=["get"])
     def tags(self, request, pk=None):
-        page_tags = get_page_tags(page_pk=pk)
-        serializer = self.get_serializer(page_tags, many=True)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return self.paginated_response(get_page_tags(page_pk=pk))
 
     @action(detail=True, methods=["post"], url_path="add-tag")
     def add_tag_to_page(self, request, pk=None):
@@ -405,5 +444,5 @@ class CurrentUserPagesViewSet(
 
     def get_queryset(self):
         if self.request.user.role in ("admin", "moderator"):
-            return Page.objects.all().order_by("id")
-        return get_unblocked_pages()
+            return self.eager_load(Page.objects.all().order_by("id"))
+        return self.eager_load(get_unblocked_pages())
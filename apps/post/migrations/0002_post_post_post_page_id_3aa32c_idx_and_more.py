@@ -0,0 +1,24 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["page", "-created_at", "-id"],
+                name="post_post_page_id_3aa32c_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["-created_at", "-id"], name="post_post_created_e7346e_idx"),
+        ),
+    ]
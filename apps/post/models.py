@@ -13,3 +13,10 @@ class Post(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Keyset pagination of the newest posts, per page and overall.
+        indexes = [
+            models.Index(fields=["page", "-created_at", "-id"]),
+            models.Index(fields=["-created_at", "-id"]),
+        ]
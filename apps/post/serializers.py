@@ -28,7 +28,7 @@ class UpdatePostSerializer(serializers.ModelSerializer):
 
 
 class ListPostSerializer(serializers.ModelSerializer):
-    page = serializers.ReadOnlyField(source="page.id")
+    page = serializers.ReadOnlyField(source="page_id")
 
     class Meta:
         model = Post
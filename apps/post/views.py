@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.mixins import ListModelMixin
@@ -5,17 +6,20 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
+from apps.outbox.services import add_event
 from apps.page.models import Page
 from apps.page.permissions import IsAdminOrModerator
+from apps.page.services import change_page_counters
 from apps.post.models import Post
 from apps.post.permissions import IsBlockedPage, IsOwner, IsPublicPage
 from apps.post.serializers import ListPostSerializer, PostSerializer, UpdatePostSerializer
 from apps.post.services import send_email_to_followers
-from apps.producer import publish
-from innotter.basic_mixin import GetPermissionsMixin
+from innotter.basic_mixin import GetPermissionsMixin, PaginatedActionMixin
+from innotter.pagination import NewestFirstPagination
 
 
 class PostViewSet(GetPermissionsMixin, ModelViewSet):
+    pagination_class = NewestFirstPagination
     detail_serializer_classes = {
         "update": UpdatePostSerializer,
     }
@@ -51,14 +55,18 @@ class PostViewSet(GetPermissionsMixin, ModelViewSet):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        with transaction.atomic():
+            self.perform_create(serializer)
+            change_page_counters(self.kwargs.get('page_pk'), posts_count=1)
+            add_event("post_created", self.kwargs.get('page_pk'))
         send_email_to_followers(serializer.data, self.kwargs.get('page_pk'))
-        publish("post_created", self.kwargs.get('page_pk'))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         response = super().destroy(request, *args, **kwargs)
-        publish("post_deleted", self.kwargs.get('page_pk'))
+        change_page_counters(self.kwargs.get('page_pk'), posts_count=-1)
+        add_event("post_deleted", self.kwargs.get('page_pk'))
         return response
 
     def get_serializer_class(self):
@@ -70,8 +78,9 @@ class PostViewSet(GetPermissionsMixin, ModelViewSet):
         return Post.objects.filter(page=Page.objects.get(pk=self.kwargs.get('page_pk')))
 
 
-class AllPostViewSet(GenericViewSet, ListModelMixin):
+class AllPostViewSet(PaginatedActionMixin, GenericViewSet, ListModelMixin):
     queryset = Post.objects.all()
+    pagination_class = NewestFirstPagination
     permission_classes = (
         IsAuthenticated,
         IsAdminOrModerator,
@@ -83,6 +92,4 @@ class AllPostViewSet(GenericViewSet, ListModelMixin):
         methods=("get",),
     )
     def get_all_posts(self, request):
-        data = ListPostSerializer(data=Post.objects.all(), many=True)
-        data.is_valid()
-        return Response(data=data.data, status=status.HTTP_200_OK)
+        return self.paginated_response(Post.objects.all())
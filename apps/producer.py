@@ -1,20 +1,278 @@
-from json import dumps
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
 
+import msgpack
 import pika
+from pika.exceptions import AMQPChannelError, AMQPConnectionError, AMQPError
 
-from innotter.settings import RABBIT_QUEUE_NAME, RABBITMQ_HOST, RABBITMQ_PASS, RABBITMQ_PORT, RABBITMQ_USER
+from innotter.settings import (
+    RABBIT_QUEUE_NAME,
+    RABBITMQ_BLOCKED_CONNECTION_TIMEOUT,
+    RABBITMQ_HEARTBEAT,
+    RABBITMQ_HOST,
+    RABBITMQ_PASS,
+    RABBITMQ_PORT,
+    RABBITMQ_PUBLISH_BATCH_SIZE,
+    RABBITMQ_PUBLISH_FLUSH_TIMEOUT,
+    RABBITMQ_PUBLISH_MODE,
+    RABBITMQ_PUBLISH_OVERFLOW,
+    RABBITMQ_PUBLISH_QUEUE_SIZE,
+    RABBITMQ_USER,
+)
 
+PUBLISH_RETRY_DELAYS = (0.5, 1, 2)
 
-def publish(method, body):
+# Events are sent as msgpack envelopes {"id", "type", "v", "data"}; bump the version on payload changes.
+EVENT_CONTENT_TYPE = "application/x-msgpack"
+EVENT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class Publisher:
+    """Long-lived RabbitMQ publisher shared by everything in the current process.
+
+    The connection and channel are opened lazily on the first publish and reused afterwards.
+    They are reopened after a fork (gunicorn/celery workers inherit the parent's socket)
+    and once on any connection or channel error. The channel is transactional: a publish,
+    or a whole batch, only returns once tx_commit shows that the broker has accepted it.
+    That costs one round trip per batch rather than one per message as in confirm mode.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self._channel = None
+
+    def publish(self, method, body, event_id):
+        with self._lock:
+            try:
+                self._publish_committed([(method, body, event_id)])
+            except (AMQPConnectionError, AMQPChannelError):
+                self._reset()
+                self._publish_committed([(method, body, event_id)])
+
+    def publish_batch(self, messages):
+        """Publish (method, body, event_id) triples in order. Broker errors drop the connection and are re-raised."""
+        with self._lock:
+            try:
+                self._publish_committed(messages)
+            except (AMQPConnectionError, AMQPChannelError):
+                self._reset()
+                raise
+
+    def close(self):
+        with self._lock:
+            self._reset()
+
+    def _publish_committed(self, messages):
+        channel = self._get_channel()
+        for method, body, event_id in messages:
+            self._basic_publish(channel, method, body, event_id)
+        channel.tx_commit()
+
+    def _basic_publish(self, channel, method, body, event_id):
+        channel.basic_publish(
+            exchange="",
+            routing_key=RABBIT_QUEUE_NAME,
+            body=encode_event(method, body, event_id),
+            properties=pika.BasicProperties(
+                content_type=EVENT_CONTENT_TYPE, type=method, message_id=event_id, timestamp=int(time.time())
+            ),
+        )
+
+    def _get_channel(self):
+        if self._pid != os.getpid():
+            # The sockets belong to the parent process, never touch them from a forked child.
+            self._reset()
+
+        if self._connection is None or self._connection.is_closed:
+            self._connection = pika.BlockingConnection(_connection_parameters())
+            self._channel = None
+            self._pid = os.getpid()
+        else:
+            # Lets pika answer broker heartbeats between publishes.
+            self._connection.process_data_events(time_limit=0)
+
+        if self._channel is None or self._channel.is_closed:
+            self._channel = self._connection.channel()
+            self._channel.tx_select()
+
+        return self._channel
+
+    def _reset(self):
+        if self._pid == os.getpid() and self._connection is not None and self._connection.is_open:
+            # A channel error can leave the connection open, close it so its socket is not leaked.
+            try:
+                self._connection.close()
+            except AMQPError:
+                logger.warning("Could not close the RabbitMQ connection", exc_info=True)
+        self._pid = None
+        self._connection = None
+        self._channel = None
+
+
+def _connection_parameters():
     credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS)
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(host=RABBITMQ_HOST, port=RABBITMQ_PORT, credentials=credentials)
-    )
-    channel = connection.channel()
-    properties = pika.BasicProperties(method)
-    channel.basic_publish(
-        exchange="",
-        routing_key=RABBIT_QUEUE_NAME,
-        body=dumps(body),
-        properties=properties,
+    return pika.ConnectionParameters(
+        host=RABBITMQ_HOST,
+        port=RABBITMQ_PORT,
+        credentials=credentials,
+        heartbeat=RABBITMQ_HEARTBEAT,
+        blocked_connection_timeout=RABBITMQ_BLOCKED_CONNECTION_TIMEOUT,
     )
+
+
+class BackgroundPublisher:
+    """Moves publishing off the caller's thread.
+
+    submit() only puts the message on a bounded in-process queue. A daemon thread drains it in batches
+    through the transactional Publisher and then notifies the listeners with the keys of the published messages.
+    When the queue is full the message is, depending on `overflow`, waited for ("block") or dropped ("drop").
+    Keyed messages are first claimed through the claimer, so that each is sent by one owner only: what the
+    thread drops, fails to send or cannot claim is left to the outbox relay.
+    """
+
+    def __init__(self, publisher, maxsize, batch_size, overflow="block"):
+        if overflow not in ("block", "drop"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        self._publisher = publisher
+        self._maxsize = maxsize
+        self._batch_size = batch_size
+        self._overflow = overflow
+        self._start_lock = threading.Lock()
+        self._listeners = []
+        self._claimer = None
+        self._pid = None
+        self._queue = None
+
+    def add_listener(self, callback):
+        """Register callback(keys), called from the publishing thread after each committed batch."""
+        self._listeners.append(callback)
+
+    def set_claimer(self, callback):
+        """Register callback(keys) -> claimed keys, called from the publishing thread before each batch."""
+        self._claimer = callback
+
+    def submit(self, method, body, event_id=None, key=None) -> bool:
+        message_queue = self._get_queue()
+        message = (method, body, event_id or new_event_id(), key)
+        if self._overflow == "block":
+            message_queue.put(message)
+            return True
+
+        try:
+            message_queue.put_nowait(message)
+        except queue.Full:
+            return False
+        return True
+
+    def flush(self, timeout=None) -> bool:
+        """Wait until everything submitted so far has been handled, False if the timeout ran out first."""
+        if self._pid != os.getpid():
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _get_queue(self):
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    # A forked child inherits the queue but not the thread draining it.
+                    self._queue = queue.Queue(self._maxsize)
+                    threading.Thread(target=self._run, name="rabbitmq-publisher", daemon=True).start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self._send(self._claim(batch))
+            except Exception:
+                logger.exception("Dropped a batch of %s messages", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _take_batch(self):
+        batch = [self._queue.get()]
+        try:
+            while len(batch) < self._batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _claim(self, batch):
+        keys = [key for *_, key in batch if key is not None]
+        if self._claimer is None or not keys:
+            return batch
+        claimed = set(self._claimer(keys))
+        return [message for message in batch if message[3] is None or message[3] in claimed]
+
+    def _send(self, batch):
+        if not batch:
+            return
+
+        for delay in (*PUBLISH_RETRY_DELAYS, None):
+            try:
+                self._publisher.publish_batch(message[:3] for message in batch)
+                break
+            except AMQPError:
+                if delay is None:
+                    logger.exception("Could not publish a batch of %s messages", len(batch))
+                    return
+                time.sleep(delay)
+
+        keys = [key for *_, key in batch if key is not None]
+        for listener in self._listeners:
+            try:
+                listener(keys)
+            except Exception:
+                logger.exception("Publish listener %r failed", listener)
+
+
+def new_event_id() -> str:
+    return uuid.uuid4().hex
+
+
+def encode_event(method, body, event_id) -> bytes:
+    return msgpack.packb({"id": event_id, "type": method, "v": EVENT_VERSION, "data": body})
+
+
+publisher = Publisher()
+background_publisher = BackgroundPublisher(
+    publisher,
+    maxsize=RABBITMQ_PUBLISH_QUEUE_SIZE,
+    batch_size=RABBITMQ_PUBLISH_BATCH_SIZE,
+    overflow=RABBITMQ_PUBLISH_OVERFLOW,
+)
+atexit.register(background_publisher.flush, RABBITMQ_PUBLISH_FLUSH_TIMEOUT)
+
+
+def publish(method, body, event_id=None):
+    """Publish an event. Retried publishes of the same event must pass the same event_id so consumers can dedup it."""
+    event_id = event_id or new_event_id()
+    if RABBITMQ_PUBLISH_MODE == "background":
+        background_publisher.submit(method, body, event_id=event_id)
+    else:
+        publisher.publish(method, body, event_id)
+
+
+def publish_batch(messages):
+    publisher.publish_batch(messages)
@@ -61,4 +61,4 @@ class TestLikeEndpoint:
         response = list_viewset(request)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == Like.objects.all().count()
+        assert len(response.data["results"]) == Like.objects.all().count()
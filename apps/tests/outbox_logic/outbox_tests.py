@@ -0,0 +1,70 @@
+import pytest
+from pika.exceptions import AMQPConnectionError
+
+from apps.outbox.models import OutboxEvent
+from apps.outbox.services import add_event, claim_events, relay_events
+
+pytestmark = pytest.mark.django_db
+
+
+class TestOutbox:
+    def test_relay_publishes_in_order_and_deletes(self, mocker):
+        publish_batch = mocker.patch("apps.outbox.services.publish_batch")
+
+        first, second = add_event("page_created", {"id": 1}), add_event("like_created", 1)
+
+        relayed = relay_events()
+
+        assert relayed == 2
+        assert list(publish_batch.call_args.args[0]) == [
+            ("page_created", {"id": 1}, first.event_id.hex),
+            ("like_created", 1, second.event_id.hex),
+        ]
+        assert not OutboxEvent.objects.exists()
+
+    def test_relay_respects_batch_size(self, mocker):
+        mocker.patch("apps.outbox.services.publish_batch")
+        for _ in range(3):
+            add_event("post_created", 1)
+
+        assert relay_events(batch_size=2) == 2
+        assert OutboxEvent.objects.count() == 1
+
+    def test_relay_keeps_events_on_broker_error(self, mocker):
+        mocker.patch("apps.outbox.services.publish_batch", side_effect=AMQPConnectionError())
+        add_event("like_created", 1)
+
+        with pytest.raises(AMQPConnectionError):
+            relay_events()
+
+        assert OutboxEvent.objects.count() == 1
+
+    def test_background_mode_submits_after_commit(self, mocker, django_capture_on_commit_callbacks):
+        mocker.patch("apps.outbox.services.RABBITMQ_PUBLISH_MODE", "background")
+        submit = mocker.patch("apps.outbox.services.background_publisher.submit")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            event = add_event("follower_added", 1)
+            submit.assert_not_called()
+
+        submit.assert_called_once_with("follower_added", 1, event_id=event.event_id.hex, key=event.pk)
+
+    def test_claimed_events_are_left_to_the_background_publisher(self, mocker):
+        publish_batch = mocker.patch("apps.outbox.services.publish_batch")
+        claimed, pending = add_event("like_created", 1), add_event("like_created", 2)
+
+        assert claim_events([claimed.pk]) == [claimed.pk]
+        assert claim_events([claimed.pk]) == []
+        assert relay_events() == 1
+
+        assert [message[2] for message in publish_batch.call_args.args[0]] == [pending.event_id.hex]
+        assert list(OutboxEvent.objects.all()) == [claimed]
+
+    def test_relay_takes_over_expired_claims(self, mocker):
+        mocker.patch("apps.outbox.services.publish_batch")
+        mocker.patch("apps.outbox.services.OUTBOX_CLAIM_TTL", -1)
+        event = add_event("like_created", 1)
+
+        claim_events([event.pk])
+
+        assert relay_events() == 1
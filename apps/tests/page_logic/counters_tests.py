@@ -0,0 +1,121 @@
+import pytest
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.test import force_authenticate
+
+from apps.page.models import Page
+from apps.page.services import (
+    accept_all_follow_requests,
+    accept_follow_request,
+    change_page_counters,
+    deny_follow_request,
+    follow_page,
+    unfollow_page,
+)
+from apps.page.views import PagesListViewSet
+from apps.user.models import User
+
+pytestmark = pytest.mark.django_db
+
+page_view = PagesListViewSet.as_view({"get": "retrieve"})
+
+
+@pytest.fixture()
+def public_page():
+    return baker.make(Page, is_private=False, is_permanently_blocked=False, unblock_date=None)
+
+
+@pytest.fixture()
+def private_page():
+    return baker.make(Page, is_private=True, is_permanently_blocked=False, unblock_date=None)
+
+
+def counters(page: Page) -> tuple:
+    page.refresh_from_db()
+    return page.followers_count, page.follow_requests_count, page.posts_count
+
+
+class TestPageCounters:
+    def test_follow_and_unfollow(self, public_page):
+        user = baker.make(User)
+
+        follow_page(user, public_page.pk)
+        follow_page(user, public_page.pk)
+        assert counters(public_page) == (1, 0, 0)
+
+        unfollow_page(user, public_page.pk)
+        unfollow_page(user, public_page.pk)
+        assert counters(public_page) == (0, 0, 0)
+
+    def test_follow_reports_changes(self, public_page, private_page):
+        user = baker.make(User)
+
+        assert follow_page(user, public_page.pk) == (False, True)
+        assert follow_page(user, public_page.pk) == (False, False)
+        assert unfollow_page(user, public_page.pk)
+        assert not unfollow_page(user, public_page.pk)
+
+        private_page.followers.add(user)
+        assert follow_page(user, private_page.pk) == (True, False)
+        assert not private_page.follow_requests.exists()
+
+    def test_follow_requests(self, private_page):
+        users = baker.make(User, _quantity=3)
+        for user in users:
+            follow_page(user, private_page.pk)
+        follow_page(users[0], private_page.pk)
+        assert counters(private_page) == (0, 3, 0)
+
+        deny_follow_request(users[0].email, private_page.pk)
+        assert counters(private_page) == (0, 2, 0)
+
+        accept_all_follow_requests(private_page.pk)
+        assert counters(private_page) == (2, 0, 0)
+
+    def test_accept_follow_request_reports_new_followers(self, private_page):
+        requester, follower = baker.make(User, _quantity=2)
+        follow_page(requester, private_page.pk)
+        private_page.followers.add(follower)
+        change_page_counters(private_page.pk, followers_count=1)
+
+        assert accept_follow_request(requester.email, private_page.pk)
+        assert not accept_follow_request(follower.email, private_page.pk)
+        assert counters(private_page) == (2, 0, 0)
+
+    def test_deleting_a_user_drops_its_relations(self, public_page, private_page):
+        follower, requester = baker.make(User, _quantity=2)
+        follow_page(follower, public_page.pk)
+        follow_page(requester, public_page.pk)
+        follow_page(follower, private_page.pk)
+        follow_page(requester, private_page.pk)
+
+        User.objects.filter(pk=follower.pk).delete()
+        requester.delete()
+
+        assert counters(public_page) == (0, 0, 0)
+        assert counters(private_page) == (0, 0, 0)
+
+    def test_counters_do_not_go_negative(self, public_page):
+        change_page_counters(public_page.pk, followers_count=-1, posts_count=-2)
+
+        assert counters(public_page) == (0, 0, 0)
+
+
+class TestPageDetail:
+    def test_returns_counts_and_bounded_followers_preview(self, public_page, api_factory, mocker):
+        mocker.patch("innotter.settings.PAGE_FOLLOWERS_PREVIEW_SIZE", 2)
+        owner = public_page.owner
+        owner.role = User.Roles.USER
+        owner.save()
+        followers = baker.make(User, _quantity=4)
+        for user in followers:
+            follow_page(user, public_page.pk)
+
+        request = api_factory.get(f"/page/pages/{public_page.pk}/")
+        force_authenticate(request, user=owner, token=owner.access_token)
+        response = page_view(request, pk=public_page.pk)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["followers_count"] == 4
+        assert response.data["followers"] == [user.username for user in followers[:2]]
+        assert "follow_requests" not in response.data
@@ -46,6 +46,8 @@ accept_follow_request_view = CurrentUserPagesViewSet.as_view({"post": "accept_fo
 deny_follow_request_view = CurrentUserPagesViewSet.as_view({"post": "deny_follow_request"})
 accept_all_requests_view = CurrentUserPagesViewSet.as_view({"post": "accept_all_follow_requests"})
 deny_all_requests_view = CurrentUserPagesViewSet.as_view({"post": "deny_all_follow_requests"})
+accept_requests_view = CurrentUserPagesViewSet.as_view({"post": "accept_follow_requests"})
+deny_requests_view = CurrentUserPagesViewSet.as_view({"post": "deny_follow_requests"})
 get_tags_view = CurrentUserPagesViewSet.as_view({"get": "tags"})
 add_tag_view = CurrentUserPagesViewSet.as_view({"post": "add_tag_to_page"})
 remove_tag_view = CurrentUserPagesViewSet.as_view({"delete": "remove_tag_from_page"})
@@ -95,7 +97,7 @@ class TestPageEndpoint:
         response = list_page_view(request)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == Page.objects.all().count()
+        assert len(response.data["results"]) == Page.objects.all().count()
 
     def test_update(self, user, page, update_json, expected_update_json, api_factory, mocker):
         request = api_factory.put(f"{self.endpoint}/my-pages/{page.pk}/", update_json, format="json")
@@ -180,7 +182,7 @@ class TestPageEndpoint:
 
         assert response.status_code == status.HTTP_200_OK
         assert (
-            len(response.data)
+            len(response.data["results"])
             == Page.objects.filter(
                 Q(is_permanently_blocked=True) | (Q(unblock_date__isnull=False) & Q(unblock_date__gt=datetime.now()))
             ).count()
@@ -210,6 +212,22 @@ class TestPageEndpoint:
 
         assert response.status_code == status.HTTP_200_OK
 
+    def test_follow_twice(self, user, page, api_factory, mocker):
+        page.is_private = False
+        page.save()
+        add_event = mocker.patch("apps.page.views.add_event")
+        responses = []
+        for _ in range(2):
+            request = api_factory.post(f"{self.endpoint}/pages/{page.pk}/follow/")
+            force_authenticate(request, user=user, token=user.access_token)
+            responses.append(follow_view(request, pk=page.pk))
+
+        assert [response.status_code for response in responses] == [
+            status.HTTP_200_OK,
+            status.HTTP_400_BAD_REQUEST,
+        ]
+        add_event.assert_called_once_with("follower_added", page.pk)
+
     def test_unfollow(
         self,
         user,
@@ -223,6 +241,17 @@ class TestPageEndpoint:
 
         assert response.status_code == status.HTTP_200_OK
 
+    def test_unfollow_publishes_only_on_change(self, user, page, api_factory, mocker):
+        page.followers.add(user)
+        add_event = mocker.patch("apps.page.views.add_event")
+        for _ in range(2):
+            request = api_factory.post(f"{self.endpoint}/pages/{page.pk}/unfollow/")
+            force_authenticate(request, user=user, token=user.access_token)
+            unfollow_view(request, pk=page.pk)
+
+        assert not page.followers.filter(pk=user.pk).exists()
+        add_event.assert_called_once_with("follower_deleted", page.pk)
+
     def test_page_follow_requests(
         self,
         user,
@@ -249,6 +278,21 @@ class TestPageEndpoint:
 
         assert response.status_code == status.HTTP_200_OK
 
+    def test_accept_follow_request_of_a_follower_publishes_nothing(self, user, new_user, page, api_factory, mocker):
+        new_user.save()
+        page.followers.add(new_user)
+        request = api_factory.post(
+            f"{self.endpoint}/my-pages/{page.pk}/accept-follower/", {"email": new_user.email}, format="json"
+        )
+        force_authenticate(request, user=user, token=user.access_token)
+        add_event = mocker.patch("apps.page.views.add_event")
+
+        mocker.patch("apps.page.permissions.IsPageOwner.has_object_permission", return_value=True)
+        response = accept_follow_request_view(request, pk=page.pk)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert not add_event.called
+
     def test_deny_follow_request(self, user, new_user, page, api_factory, mocker):
         new_user.save()
         page.follow_requests.add(new_user)
@@ -287,6 +331,52 @@ class TestPageEndpoint:
         assert response.status_code == status.HTTP_200_OK
         assert page.follow_requests.count() == 0
 
+    def test_accept_follow_requests(self, user, page, api_factory, mocker):
+        users = baker.make(User, _refresh_after_create=True, _quantity=4)
+        page.follow_requests.add(*users)
+        page.followers.add(users[0])
+        request = api_factory.post(
+            f"{self.endpoint}/my-pages/{page.pk}/accept-followers/",
+            {"emails": [users[0].email, users[1].email], "ids": [users[2].pk]},
+            format="json",
+        )
+        force_authenticate(request, user=user, token=user.access_token)
+
+        mocker.patch("apps.page.permissions.IsPageOwner.has_object_permission", return_value=True)
+        mocker.patch("apps.page.permissions.IsBlockedPage.has_object_permission", return_value=True)
+        add_event = mocker.patch("apps.page.views.add_event")
+        response = accept_requests_view(request, pk=page.pk)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(page.followers.all()) == set(users[:3])
+        assert list(page.follow_requests.all()) == [users[3]]
+        add_event.assert_called_once_with("follower_added_all", {"page_id": page.pk, "quantity": 2})
+
+    def test_deny_follow_requests(self, user, page, api_factory, mocker):
+        users = baker.make(User, _refresh_after_create=True, _quantity=3)
+        page.follow_requests.add(*users)
+        request = api_factory.post(
+            f"{self.endpoint}/my-pages/{page.pk}/deny-followers/", {"ids": [users[0].pk, users[1].pk]}, format="json"
+        )
+        force_authenticate(request, user=user, token=user.access_token)
+
+        mocker.patch("apps.page.permissions.IsPageOwner.has_object_permission", return_value=True)
+        mocker.patch("apps.page.permissions.IsBlockedPage.has_object_permission", return_value=True)
+        response = deny_requests_view(request, pk=page.pk)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert list(page.follow_requests.all()) == [users[2]]
+
+    def test_follow_requests_need_emails_or_ids(self, user, page, api_factory, mocker):
+        request = api_factory.post(f"{self.endpoint}/my-pages/{page.pk}/deny-followers/", {}, format="json")
+        force_authenticate(request, user=user, token=user.access_token)
+
+        mocker.patch("apps.page.permissions.IsPageOwner.has_object_permission", return_value=True)
+        mocker.patch("apps.page.permissions.IsBlockedPage.has_object_permission", return_value=True)
+        response = deny_requests_view(request, pk=page.pk)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_get_tags(self, user, page, api_factory, mocker):
         request = api_factory.get(f"{self.endpoint}/my-pages/{page.pk}/tags/")
         force_authenticate(request, user=user, token=user.access_token)
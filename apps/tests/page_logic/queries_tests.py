@@ -0,0 +1,114 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.test import force_authenticate
+
+from apps.page.models import Page
+from apps.page.services import accept_follow_requests, deny_follow_requests
+from apps.page.views import CurrentUserPagesViewSet, PagesListViewSet
+from apps.tag.models import Tag
+from apps.user.models import User
+
+pytestmark = pytest.mark.django_db
+
+list_view = PagesListViewSet.as_view({"get": "list"})
+page_view = PagesListViewSet.as_view({"get": "retrieve"})
+blocked_view = PagesListViewSet.as_view({"get": "blocked"})
+my_pages_view = CurrentUserPagesViewSet.as_view({"get": "list"})
+
+
+def count_queries(view, api_factory, user, **kwargs):
+    request = api_factory.get("/")
+    force_authenticate(request, user=user, token=user.access_token)
+    with CaptureQueriesContext(connection) as queries:
+        response = view(request, **kwargs)
+    assert response.status_code == status.HTTP_200_OK
+    return len(queries)
+
+
+def make_page(**kwargs):
+    kwargs = {"is_private": False, "is_permanently_blocked": False, "unblock_date": None, **kwargs}
+    page = baker.make(Page, **kwargs)
+    page.followers.set(baker.make(User, _quantity=3))
+    page.follow_requests.set(baker.make(User, _quantity=2))
+    page.tags.set(baker.make(Tag, _quantity=2))
+    return page
+
+
+class TestPageQueryCounts:
+    @pytest.mark.parametrize("view", (list_view, my_pages_view))
+    def test_list_query_count_does_not_grow_with_pages(self, view, api_factory):
+        user = baker.make(User, role=User.Roles.USER)
+        make_page()
+        few = count_queries(view, api_factory, user)
+
+        for _ in range(5):
+            make_page()
+
+        assert count_queries(view, api_factory, user) == few
+
+    def test_blocked_query_count_does_not_grow_with_pages(self, api_factory):
+        admin = baker.make(User, role=User.Roles.ADMIN)
+        make_page(is_permanently_blocked=True)
+        few = count_queries(blocked_view, api_factory, admin)
+
+        for _ in range(5):
+            make_page(is_permanently_blocked=True)
+
+        assert count_queries(blocked_view, api_factory, admin) == few
+
+    @pytest.mark.parametrize("role", (User.Roles.USER, User.Roles.ADMIN))
+    def test_retrieve_query_count_does_not_grow_with_relations(self, role, api_factory):
+        user = baker.make(User, role=role)
+        small, large = make_page(owner=user), make_page(owner=user)
+        large.followers.add(*baker.make(User, _quantity=10))
+        large.tags.add(*baker.make(Tag, _quantity=5))
+
+        assert count_queries(page_view, api_factory, user, pk=large.pk) == count_queries(
+            page_view, api_factory, user, pk=small.pk
+        )
+
+
+class TestFollowRequestQueryCounts:
+    @pytest.mark.parametrize("service", (accept_follow_requests, deny_follow_requests))
+    def test_query_count_does_not_grow_with_requests(self, service):
+        few, many = make_page(), make_page()
+        many.follow_requests.add(*baker.make(User, _quantity=20))
+
+        with CaptureQueriesContext(connection) as few_queries:
+            service(few.pk)
+        with CaptureQueriesContext(connection) as many_queries:
+            service(many.pk)
+
+        assert len(many_queries) == len(few_queries)
+        assert many.follow_requests.count() == 0
+
+
+class TestPagination:
+    def test_pages_are_listed_by_cursor(self, api_factory):
+        user = baker.make(User, role=User.Roles.USER)
+        pages = [make_page() for _ in range(5)]
+
+        request = api_factory.get("/page/pages/", {"page_size": 2})
+        force_authenticate(request, user=user, token=user.access_token)
+        first = list_view(request)
+        request = api_factory.get(first.data["next"])
+        force_authenticate(request, user=user, token=user.access_token)
+        second = list_view(request)
+
+        assert [page["id"] for page in first.data["results"] + second.data["results"]] == [
+            page.pk for page in pages[:4]
+        ]
+
+    def test_page_size_is_capped(self, api_factory, mocker):
+        mocker.patch("innotter.pagination.KeysetPagination.max_page_size", 3)
+        user = baker.make(User, role=User.Roles.USER)
+        for _ in range(5):
+            make_page()
+
+        request = api_factory.get("/page/pages/", {"page_size": 1000})
+        force_authenticate(request, user=user, token=user.access_token)
+
+        assert len(list_view(request).data["results"]) == 3
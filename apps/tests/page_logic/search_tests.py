@@ -0,0 +1,100 @@
+import pytest
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.test import force_authenticate
+
+from apps.page.models import Page
+from apps.page.views import PagesListViewSet
+from apps.tag.models import Tag
+from apps.user.models import User
+
+pytestmark = pytest.mark.django_db
+
+list_view = PagesListViewSet.as_view({"get": "list"})
+blocked_view = PagesListViewSet.as_view({"get": "blocked"})
+followers_view = PagesListViewSet.as_view({"get": "followers"})
+
+
+def make_page(**kwargs):
+    kwargs = {"is_private": False, "is_permanently_blocked": False, "unblock_date": None, **kwargs}
+    return baker.make(Page, **kwargs)
+
+
+def search(api_factory, user, url="/page/pages/", **params):
+    request = api_factory.get(url, params)
+    force_authenticate(request, user=user, token=user.access_token)
+    return list_view(request).data
+
+
+class TestPageSearch:
+    @pytest.fixture()
+    def user(self):
+        return baker.make(User, role=User.Roles.USER)
+
+    def test_matches_name_uuid_and_tags_without_duplicates(self, user, api_factory):
+        by_name = make_page(name="Jazz cats", uuid="aaa", description="")
+        by_uuid = make_page(name="Rock", uuid="jazz-1", description="")
+        by_tags = make_page(name="Blues", uuid="bbb", description="")
+        by_tags.tags.set([baker.make(Tag, name="jazz"), baker.make(Tag, name="jazz fusion")])
+        make_page(name="Pop", uuid="ccc", description="")
+
+        results = search(api_factory, user, search="jazz")["results"]
+
+        assert sorted(page["id"] for page in results) == sorted((by_name.pk, by_uuid.pk, by_tags.pk))
+
+    def test_orders_by_relevance(self, user, api_factory):
+        contains = make_page(name="Old jazz", uuid="aaa", description="")
+        exact = make_page(name="Jazz", uuid="bbb", description="")
+        prefix = make_page(name="Jazz cats", uuid="ccc", description="")
+
+        results = search(api_factory, user, search="jazz")["results"]
+
+        assert [page["id"] for page in results] == [exact.pk, prefix.pk, contains.pk]
+
+    def test_pages_through_ranked_results(self, user, api_factory):
+        pages = [make_page(name="Jazz" if number < 2 else f"Jazz {number}", description="") for number in range(5)]
+
+        first = search(api_factory, user, search="jazz", page_size=2)
+        second = search(api_factory, user, url=first["next"])
+        third = search(api_factory, user, url=second["next"])
+
+        ids = [page["id"] for data in (first, second, third) for page in data["results"]]
+        assert sorted(ids) == sorted(page.pk for page in pages)
+        assert ids[:2] == [pages[1].pk, pages[0].pk]
+
+    def test_blocked_pages_ignore_the_search_param(self, api_factory):
+        admin = baker.make(User, role=User.Roles.ADMIN)
+        blocked = make_page(is_permanently_blocked=True)
+
+        request = api_factory.get("/page/pages/blocked/", {"search": "jazz"})
+        force_authenticate(request, user=admin, token=admin.access_token)
+        response = blocked_view(request)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in response.data["results"]] == [blocked.pk]
+
+    def test_followers_ignore_the_search_param(self, api_factory):
+        admin = baker.make(User, role=User.Roles.ADMIN)
+        page = make_page()
+        page.followers.set(baker.make(User, _quantity=2))
+
+        request = api_factory.get(f"/page/pages/{page.pk}/followers/", {"search": "jazz"})
+        force_authenticate(request, user=admin, token=admin.access_token)
+        response = followers_view(request, pk=page.pk)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 2
+
+
+class TestPageSearchVector:
+    def test_unrelated_saves_skip_the_search_vector(self, mocker):
+        page = make_page(name="Jazz")
+        update = mocker.patch("apps.page.search.update_search_vectors")
+
+        page.is_private = True
+        page.save(update_fields=["is_private"])
+        assert not update.called
+
+        page.name = "Blues"
+        page.save(update_fields=["name"])
+        assert update.called
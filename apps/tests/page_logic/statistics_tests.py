@@ -0,0 +1,44 @@
+import pytest
+from model_bakery import baker
+
+from apps.like.models import Like
+from apps.page.models import Page
+from apps.page.statistics import iter_page_statistics, write_page_statistics
+from apps.post.models import Post
+from apps.user.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+class TestStatisticsRebuild:
+    def test_counts_posts_likes_and_followers_per_page(self):
+        quiet, busy, followed = baker.make(Page, _quantity=3)
+        posts = baker.make(Post, page=busy, _quantity=2)
+        baker.make(Like, post=posts[0], _quantity=3)
+        baker.make(Like, post=None)
+        followed.followers.set(baker.make(User, _quantity=2))
+
+        items = list(iter_page_statistics(chunk_size=1))
+
+        assert [item["page_id"] for item in items] == [quiet.pk, busy.pk, followed.pk]
+        assert items[0]["counters"] == {"amount_of_posts": 0, "amount_of_likes": 0, "amount_of_followers": 0}
+        assert items[1]["counters"] == {"amount_of_posts": 2, "amount_of_likes": 3, "amount_of_followers": 0}
+        assert items[2]["counters"] == {"amount_of_posts": 0, "amount_of_likes": 0, "amount_of_followers": 2}
+        assert items[1]["user_id"] == busy.owner_id
+
+    def test_writes_in_batches_and_retries_unprocessed_items(self, mocker, settings):
+        settings.AWS_DYNAMODB_TABLE_NAME = "statistics"
+        mocker.patch("apps.page.statistics.time.sleep")
+        client = mocker.patch("apps.page.statistics.boto3.client").return_value
+        calls = []
+
+        def batch_write_item(RequestItems):
+            requests = RequestItems["statistics"]
+            calls.append(len(requests))
+            return {"UnprocessedItems": {"statistics": requests[:1]}} if len(calls) == 1 else {}
+
+        client.batch_write_item.side_effect = batch_write_item
+        items = ({"page_id": page_id, "counters": {"amount_of_posts": 1}} for page_id in range(30))
+
+        assert write_page_statistics(items, workers=1) == 30
+        assert calls == [25, 1, 5]
@@ -89,7 +89,7 @@ class TestPostEndpoint:
         response = list_view(request, page_pk=page.pk)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == Post.objects.filter(page=Page.objects.get(pk=page.pk)).count()
+        assert len(response.data["results"]) == Post.objects.filter(page=Page.objects.get(pk=page.pk)).count()
 
     def test_get_all_posts(self, user: user, page: page, api_factory):
         request = api_factory.get("/post/posts/")
@@ -98,4 +98,4 @@ class TestPostEndpoint:
         response = get_all_view(request)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == Post.objects.all().count()
+        assert len(response.data["results"]) == Post.objects.all().count()
@@ -0,0 +1,133 @@
+import threading
+
+import msgpack
+import pytest
+from pika.exceptions import AMQPChannelError, AMQPConnectionError
+
+from apps.producer import BackgroundPublisher, Publisher
+
+
+@pytest.fixture()
+def blocking_connection(mocker):
+    mocker.patch("apps.producer._connection_parameters")
+    connection = mocker.patch("apps.producer.pika.BlockingConnection")
+    connection.return_value.is_closed = False
+    connection.return_value.channel.return_value.is_closed = False
+    return connection
+
+
+class TestPublisher:
+    def test_reuses_connection(self, blocking_connection):
+        publisher = Publisher()
+
+        publisher.publish("like_created", 1, "a")
+        publisher.publish("like_deleted", 1, "b")
+
+        assert blocking_connection.call_count == 1
+        assert blocking_connection.return_value.channel.return_value.basic_publish.call_count == 2
+
+    def test_commits_a_batch_once(self, blocking_connection):
+        channel = blocking_connection.return_value.channel.return_value
+
+        Publisher().publish_batch([("like_created", 1, "a"), ("like_created", 2, "b"), ("post_created", 1, "c")])
+
+        assert channel.basic_publish.call_count == 3
+        channel.tx_commit.assert_called_once()
+        channel.confirm_delivery.assert_not_called()
+
+    def test_publishes_versioned_envelope(self, blocking_connection):
+        Publisher().publish("follower_added_all", {"page_id": 1, "quantity": 2}, "event-id")
+
+        kwargs = blocking_connection.return_value.channel.return_value.basic_publish.call_args.kwargs
+        assert kwargs["properties"].type == "follower_added_all"
+        assert kwargs["properties"].message_id == "event-id"
+        assert kwargs["properties"].timestamp
+        assert msgpack.unpackb(kwargs["body"]) == {
+            "id": "event-id",
+            "type": "follower_added_all",
+            "v": 1,
+            "data": {"page_id": 1, "quantity": 2},
+        }
+
+    def test_reconnects_after_fork(self, blocking_connection, mocker):
+        publisher = Publisher()
+        publisher.publish("like_created", 1, "a")
+
+        mocker.patch("apps.producer.os.getpid", return_value=-1)
+        publisher.publish("like_created", 1, "b")
+
+        assert blocking_connection.call_count == 2
+
+    def test_reconnects_on_connection_error(self, blocking_connection):
+        channel = blocking_connection.return_value.channel.return_value
+        channel.basic_publish.side_effect = [AMQPConnectionError(), None]
+        publisher = Publisher()
+
+        publisher.publish("like_created", 1, "a")
+
+        assert blocking_connection.call_count == 2
+        assert channel.basic_publish.call_count == 2
+
+    def test_closes_connection_on_channel_error(self, blocking_connection):
+        channel = blocking_connection.return_value.channel.return_value
+        channel.basic_publish.side_effect = [AMQPChannelError(), None]
+        blocking_connection.return_value.is_open = True
+
+        Publisher().publish("like_created", 1, "a")
+
+        blocking_connection.return_value.close.assert_called_once()
+
+    def test_does_not_close_parent_connection_after_fork(self, blocking_connection, mocker):
+        publisher = Publisher()
+        publisher.publish("like_created", 1, "a")
+
+        mocker.patch("apps.producer.os.getpid", return_value=-1)
+        publisher.publish("like_created", 1, "b")
+
+        blocking_connection.return_value.close.assert_not_called()
+
+
+class TestBackgroundPublisher:
+    def test_publishes_in_batches_and_notifies_listeners(self, mocker):
+        publisher = mocker.Mock()
+        published = []
+        publisher.publish_batch.side_effect = lambda messages: published.append(list(messages))
+        listener = mocker.Mock()
+        background = BackgroundPublisher(publisher, maxsize=10, batch_size=10)
+        background.add_listener(listener)
+
+        for key in range(3):
+            background.submit("like_created", 1, key=key)
+
+        assert background.flush(timeout=5)
+        assert [message[:2] for message in sum(published, [])] == [("like_created", 1)] * 3
+        assert sum((call.args[0] for call in listener.call_args_list), []) == [0, 1, 2]
+
+    def test_drops_when_full(self, mocker):
+        release = threading.Event()
+        publisher = mocker.Mock()
+        publisher.publish_batch.side_effect = lambda messages: release.wait(5)
+        background = BackgroundPublisher(publisher, maxsize=1, batch_size=1, overflow="drop")
+
+        results = [background.submit("like_created", 1) for _ in range(5)]
+        release.set()
+
+        assert background.flush(timeout=5)
+        assert False in results
+
+    def test_sends_only_claimed_messages(self, mocker):
+        published = []
+        publisher = mocker.Mock()
+        publisher.publish_batch.side_effect = lambda messages: published.extend(messages)
+        listener = mocker.Mock()
+        background = BackgroundPublisher(publisher, maxsize=10, batch_size=10)
+        background.set_claimer(lambda keys: [key for key in keys if key != 1])
+        background.add_listener(listener)
+
+        for key in range(3):
+            background.submit("like_created", key, key=key)
+        background.submit("like_created", "unkeyed")
+
+        assert background.flush(timeout=5)
+        assert sorted(str(body) for _, body, _ in published) == ["0", "2", "unkeyed"]
+        assert sum((call.args[0] for call in listener.call_args_list), []) == [0, 2]
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework import status
+
+from apps.user.models import RefreshToken, User
+from apps.user.services import PasswordHashingPool
+from apps.user.utils import AsyncLoginView, AsyncRegisterView, UserMixin
+
+login_view = async_to_sync(AsyncLoginView.as_view())
+sync_login_view = UserMixin.as_view({"post": "login"})
+register_view = async_to_sync(AsyncRegisterView.as_view())
+
+pytestmark = pytest.mark.django_db
+
+
+def post(rf, path, data):
+    return rf.post(path, json.dumps({"user": data}), content_type="application/json")
+
+
+class TestAsyncAuth:
+    endpoint = "/authentication/users/async/"
+
+    def test_register_and_login(self, rf):
+        credentials = {"email": "async@example.com", "password": "qweasdzxc"}
+
+        response = register_view(
+            post(rf, f"{self.endpoint}register/", {**credentials, "username": "async", "title": "Async"})
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+        response = login_view(post(rf, f"{self.endpoint}login/", credentials))
+        assert response.status_code == status.HTTP_200_OK
+        body = json.loads(response.content)
+        assert response.cookies["refresh_token"].value == body["refresh_token"]
+        assert RefreshToken.objects.filter(user__email=credentials["email"]).count() == 2
+        assert User.objects.get(email=credentials["email"]).last_login is not None
+
+    def test_login_writes_only_the_refresh_token_and_last_login(self, rf):
+        user = baker.make(User)
+        user.set_password("qweasdzxc")
+        user.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = login_view(post(rf, f"{self.endpoint}login/", {"email": user.email, "password": "qweasdzxc"}))
+
+        assert response.status_code == status.HTTP_200_OK
+        writes = [query["sql"] for query in queries if not query["sql"].lstrip().upper().startswith("SELECT")]
+        assert len(writes) == 2
+        assert any(write.upper().startswith('INSERT INTO "USER_REFRESHTOKEN"') for write in writes)
+        assert any(write.upper().startswith('UPDATE "USER_USER" SET "LAST_LOGIN" =') for write in writes)
+
+    def test_login_with_wrong_password(self, rf):
+        user = baker.make(User)
+        user.set_password("qweasdzxc")
+        user.save()
+
+        response = login_view(post(rf, f"{self.endpoint}login/", {"email": user.email, "password": "wrong"}))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_login_fails_fast_when_pool_is_full(self, rf, mocker):
+        mocker.patch("apps.user.utils.password_hashing_pool", PasswordHashingPool(workers=1, max_pending=0))
+
+        response = login_view(post(rf, f"{self.endpoint}login/", {"email": "a@example.com", "password": "qweasdzxc"}))
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response["Retry-After"] == "1"
+
+    @pytest.mark.parametrize("state", [{"is_active": False}, {"is_blocked": True}, {}])
+    def test_login_is_refused_like_the_sync_login(self, rf, api_factory, state):
+        user = baker.make(User, **state)
+        user.set_password("qweasdzxc")
+        user.save()
+        credentials = {"email": user.email, "password": "wrong" if not state else "qweasdzxc"}
+
+        response = login_view(post(rf, f"{self.endpoint}login/", credentials))
+        sync_response = sync_login_view(
+            api_factory.post("/authentication/users/login/", {"user": credentials}, format="json")
+        )
+
+        assert response.status_code == sync_response.status_code == status.HTTP_400_BAD_REQUEST
+        assert json.loads(response.content) == sync_response.data
@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+import jwt
+import pytest
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import exceptions
+
+from apps.user.backends import _authenticate_credentials, token_cache
+from apps.user.models import RefreshToken, User
+from apps.user.services import delete_expired_refresh_tokens
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+class TestTokenCache:
+    def test_cached_token_costs_no_queries(self, api_factory, django_assert_num_queries):
+        user = baker.make(User)
+        token = user.access_token
+        _authenticate_credentials(api_factory.get("/"), token)
+
+        with django_assert_num_queries(0):
+            cached_user, _ = _authenticate_credentials(api_factory.get("/"), token)
+
+        assert cached_user.pk == user.pk
+
+    def test_save_invalidates_cached_tokens(self, api_factory):
+        user = baker.make(User)
+        token = user.access_token
+        _authenticate_credentials(api_factory.get("/"), token)
+
+        user.is_active = False
+        user.save()
+
+        with pytest.raises(exceptions.AuthenticationFailed):
+            _authenticate_credentials(api_factory.get("/"), token)
+
+    def test_evicts_least_recently_used_tokens(self, mocker):
+        mocker.patch.object(token_cache, "maxsize", 2)
+        users = baker.make(User, _quantity=3)
+        tokens = [user.access_token for user in users]
+
+        token_cache.set(tokens[0], {"exp": 2**31}, users[0])
+        token_cache.set(tokens[1], {"exp": 2**31}, users[1])
+        token_cache.get(tokens[0])
+        token_cache.set(tokens[2], {"exp": 2**31}, users[2])
+
+        assert token_cache.get(tokens[0]) is not None
+        assert token_cache.get(tokens[1]) is None
+
+
+class TestStatelessAuth:
+    def test_builds_user_from_claims_without_queries(self, api_factory, mocker, django_assert_num_queries):
+        mocker.patch("innotter.settings.AUTH_STATELESS", 1)
+        user = baker.make(User, role=User.Roles.MODERATOR)
+        token = user.access_token
+
+        with django_assert_num_queries(0):
+            principal, _ = _authenticate_credentials(api_factory.get("/"), token)
+            assert principal == user
+            assert principal.role == User.Roles.MODERATOR
+            assert principal.is_blocked is False
+            assert principal.email == user.email
+            assert principal._state.db == "default"
+
+        with django_assert_num_queries(1):
+            assert principal.title == user.title
+
+    def test_tokens_without_claims_load_the_user(self, api_factory, mocker, django_assert_num_queries):
+        user = baker.make(User)
+        token = user.access_token
+        mocker.patch("innotter.settings.AUTH_STATELESS", 1)
+
+        with django_assert_num_queries(1):
+            principal, _ = _authenticate_credentials(api_factory.get("/"), token)
+
+        assert principal.email == user.email
+
+
+class TestRefreshTokens:
+    def test_stores_a_hashed_token_per_device(self):
+        user = baker.make(User)
+
+        first, second = user.issue_refresh_token(), user.issue_refresh_token()
+
+        assert first != second
+        assert set(user.refresh_tokens.values_list("token_hash", flat=True)) == {
+            RefreshToken.hash(first),
+            RefreshToken.hash(second),
+        }
+
+    def test_expired_access_token_is_renewed_with_refresh_token(self, api_factory, mocker):
+        user = baker.make(User)
+        request = api_factory.get("/")
+        request.COOKIES["refresh_token"] = user.issue_refresh_token()
+        mocker.patch(
+            "apps.user.backends.jwt.decode",
+            side_effect=[jwt.ExpiredSignatureError, {}, {"id": user.pk, "exp": 2**31}],
+        )
+
+        authenticated_user, _ = _authenticate_credentials(request, "expired")
+
+        assert authenticated_user == user
+
+    def test_unknown_refresh_token_is_rejected(self, api_factory, mocker):
+        request = api_factory.get("/")
+        request.COOKIES["refresh_token"] = baker.make(User)._generate_refresh_token()
+        mocker.patch("apps.user.backends.jwt.decode", side_effect=[jwt.ExpiredSignatureError, {}])
+
+        with pytest.raises(exceptions.AuthenticationFailed):
+            _authenticate_credentials(request, "expired")
+
+    def test_deletes_only_expired_tokens(self):
+        user = baker.make(User)
+        baker.make(RefreshToken, user=user, expires_at=timezone.now() - timedelta(minutes=1), _quantity=3)
+        active = baker.make(RefreshToken, user=user, expires_at=timezone.now() + timedelta(days=1))
+
+        assert delete_expired_refresh_tokens(batch_size=2) == 3
+        assert list(RefreshToken.objects.all()) == [active]
@@ -33,7 +33,6 @@ def expected_json(user: User):
         "role": user.role,
         "image_s3_path": user.image_s3_path,
         "title": user.title,
-        "refresh_token": user.refresh_token,
         "is_blocked": user.is_blocked,
     }
 
@@ -46,6 +45,5 @@ def expected_update_json(user: User, new_user: User):
         "role": user.role,
         "title": new_user.title,
         "image_s3_path": new_user.image_s3_path,
-        "refresh_token": new_user.refresh_token,
         "is_blocked": new_user.is_blocked,
     }
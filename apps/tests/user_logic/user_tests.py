@@ -72,7 +72,7 @@ class TestUserEndpoints:
         response = list_view(request)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == User.objects.count()
+        assert len(response.data["results"]) == User.objects.count()
 
     def test_retrieve(
         self,
@@ -83,7 +83,6 @@ class TestUserEndpoints:
         request = api_factory.get(f"{self.endpoint}{user.pk}/")
         force_authenticate(request, user=user, token=user.access_token)
         request.COOKIES["access_token"] = user.access_token
-        request.COOKIES["refresh_token"] = user.refresh_token
 
         response = users_view(request, pk=user.pk)
         expected_json["access_token"] = user.access_token
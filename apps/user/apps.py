@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.user"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from apps.user.backends import invalidate_cached_tokens
+        from apps.user.models import User
+
+        post_save.connect(invalidate_cached_tokens, sender=User, dispatch_uid="invalidate_cached_tokens_on_save")
+        post_delete.connect(invalidate_cached_tokens, sender=User, dispatch_uid="invalidate_cached_tokens_on_delete")
@@ -1,10 +1,78 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
+from django.utils import timezone
 from rest_framework import authentication, exceptions
 
-from apps.user.models import User
+from apps.user.models import ACCESS_TOKEN_CLAIMS, RefreshToken, User
 from innotter import settings
 
 
+class TokenCache:
+    """Per-process LRU of verified access tokens and a snapshot of their users.
+
+    An entry lives until the token's exp, but at most `ttl` seconds, which bounds how long another process
+    keeps serving a user that was changed through a process whose cache got invalidated.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tokens_by_user = {}
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.time():
+                self._discard(token)
+                return None
+            self._entries.move_to_end(token)
+        return copy.copy(user)
+
+    def set(self, token: str, payload: dict, user):
+        expires_at = min(payload["exp"], time.time() + self.ttl)
+        with self._lock:
+            self._entries[token] = (expires_at, copy.copy(user))
+            self._entries.move_to_end(token)
+            self._tokens_by_user.setdefault(user.pk, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in self._tokens_by_user.pop(user_id, ()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _discard(self, token: str):
+        _, user = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user.pk)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user.pk]
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+
+def invalidate_cached_tokens(sender, instance, **kwargs):
+    """Signal receiver dropping the cached tokens of a saved, blocked, deactivated or deleted user"""
+    token_cache.invalidate_user(instance.pk)
+
+
 def expired_token(request):
     refresh_token = request.COOKIES["refresh_token"]
 
@@ -14,15 +82,25 @@ def expired_token(request):
         msg = "Authentication error. Access and refresh tokens are expired."
         raise exceptions.AuthenticationFailed(msg)
 
-    user = User.objects.get(refresh_token=refresh_token)
+    stored_token = (
+        RefreshToken.objects.select_related("user")
+        .filter(token_hash=RefreshToken.hash(refresh_token), expires_at__gt=timezone.now())
+        .first()
+    )
 
-    if not user:
-        raise User.DoesNotExist
+    if not stored_token:
+        msg = "Authentication error. Invalid refresh token."
+        raise exceptions.AuthenticationFailed(msg)
 
-    return user.access_token
+    return stored_token.user.access_token
 
 
 def _authenticate_credentials(request, access_token):
+    user = token_cache.get(access_token)
+    if user is not None:
+        request.COOKIES["access_token"] = access_token
+        return user, access_token
+
     try:
         payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms="HS256")
     except jwt.ExpiredSignatureError:
@@ -36,16 +114,21 @@ def _authenticate_credentials(request, access_token):
         msg = "The user corresponding to the given token was not found."
         raise exceptions.AuthenticationFailed(msg)
 
-    try:
-        user = User.objects.get(pk=payload["id"])
-    except User.DoesNotExist:
-        msg = "The user corresponding to the given token was not found."
-        raise exceptions.AuthenticationFailed(msg)
+    if settings.AUTH_STATELESS and all(claim in payload for claim in ACCESS_TOKEN_CLAIMS):
+        # Tokens issued before the mode was switched on lack the claims and still go to the DB.
+        user = User.from_access_token_claims(payload)
+    else:
+        try:
+            user = User.objects.get(pk=payload["id"])
+        except User.DoesNotExist:
+            msg = "The user corresponding to the given token was not found."
+            raise exceptions.AuthenticationFailed(msg)
 
     if not user.is_active:
         msg = "This user has been disabled."
         raise exceptions.AuthenticationFailed(msg)
 
+    token_cache.set(access_token, payload, user)
     request.COOKIES["access_token"] = access_token
 
     return user, access_token
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.user.services import delete_expired_refresh_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired refresh tokens"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        deleted = delete_expired_refresh_tokens(options["batch_size"])
+        self.stdout.write(f"Deleted {deleted} expired refresh tokens")
@@ -0,0 +1,69 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:34
+
+import hashlib
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+import jwt
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_refresh_tokens(apps, schema_editor):
+    """Keeps the users logged in: moves their current refresh token to the new table"""
+    User = apps.get_model("user", "User")
+    RefreshToken = apps.get_model("user", "RefreshToken")
+    tokens = []
+    for user_id, token in User.objects.exclude(refresh_token="").values_list("pk", "refresh_token").iterator():
+        try:
+            exp = jwt.decode(token, settings.SECRET_KEY, algorithms="HS256")["exp"]
+        except jwt.PyJWTError:
+            continue
+        tokens.append(
+            RefreshToken(
+                user_id=user_id,
+                token_hash=hashlib.sha256(token.encode()).hexdigest(),
+                expires_at=datetime.fromtimestamp(exp, timezone.utc),
+            )
+        )
+    RefreshToken.objects.bulk_create(tokens, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0002_user_refresh_token"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RefreshToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token_hash", models.CharField(max_length=64, unique=True)),
+                ("expires_at", models.DateTimeField(db_index=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="refresh_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(copy_refresh_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="user",
+            name="refresh_token",
+        ),
+    ]
@@ -1,11 +1,19 @@
+import hashlib
+import uuid
 from datetime import datetime, timedelta
 
 import jwt
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, router
+from django.utils import timezone
 
 from innotter import settings
 
+# Claims added to access tokens in stateless auth mode, enough for the role and block checks and the identity of
+# the user. Endpoints that need the rest of the profile load the user explicitly.
+ACCESS_TOKEN_CLAIMS = ("email", "username", "role", "is_blocked", "is_active")
+REFRESH_TOKEN_LIFETIME = timedelta(days=1)
+
 
 class User(AbstractUser):
     class Roles(models.TextChoices):
@@ -19,32 +27,39 @@ class User(AbstractUser):
     role = models.CharField(max_length=9, choices=Roles.choices)
     title = models.CharField(max_length=80)
     is_blocked = models.BooleanField(default=False)
-    refresh_token = models.CharField(max_length=255, blank=True)
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
 
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_access_token_claims(cls, payload):
+        """Builds the user from stateless access-token claims, its other fields are deferred and loaded on access"""
+        values = {"id": payload["id"], **{claim: payload[claim] for claim in ACCESS_TOKEN_CLAIMS}}
+        # from_db() expects the values in the order of the model's fields.
+        field_names = [field.attname for field in cls._meta.concrete_fields if field.attname in values]
+        return cls.from_db(router.db_for_read(cls), field_names, [values[name] for name in field_names])
+
     @property
     def access_token(self):
         return self._generate_access_jwt_token()
 
-    @property
-    def set_and_get_refresh_token(self):
+    def issue_refresh_token(self):
+        """Stores a new refresh token for this device with a single insert and returns it"""
+        expires_at = timezone.now() + REFRESH_TOKEN_LIFETIME
         refresh_token = self._generate_refresh_token()
-        self.refresh_token = refresh_token
-        self.save()
+        RefreshToken.objects.create(user=self, token_hash=RefreshToken.hash(refresh_token), expires_at=expires_at)
         return refresh_token
 
-    def update_refresh_token(self):
-        self.refresh_token = self._generate_refresh_token()
-        self.save()
-
     def _generate_access_jwt_token(self):
         dt = datetime.now() + timedelta(minutes=5)
+        claims = {"id": self.pk, "exp": int(dt.strftime("%s"))}
+        if settings.AUTH_STATELESS:
+            claims.update((claim, getattr(self, claim)) for claim in ACCESS_TOKEN_CLAIMS)
+
         token = jwt.encode(
-            {"id": self.pk, "exp": int(dt.strftime("%s"))},
+            claims,
             settings.SECRET_KEY,
             # algorithm="HS256",   //default one
         )
@@ -52,12 +67,26 @@ class User(AbstractUser):
         return token
 
     def _generate_refresh_token(self):
-        dt = datetime.now() + timedelta(days=1)
+        dt = datetime.now() + REFRESH_TOKEN_LIFETIME
 
         token = jwt.encode(
-            {"exp": int(dt.strftime("%s"))},
+            # jti keeps the tokens of logins within the same second apart.
+            {"exp": int(dt.strftime("%s")), "jti": uuid.uuid4().hex},
             settings.SECRET_KEY,
             # algorithm="HS256",
         )
 
         return token
+
+
+class RefreshToken(models.Model):
+    """A refresh token of one logged in device. Only the token's hash is stored"""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="refresh_tokens")
+    token_hash = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def hash(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
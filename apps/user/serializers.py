@@ -1,7 +1,8 @@
-from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
 from rest_framework import serializers
 
 from apps.user.models import User
+from apps.user.services import check_login, create_user, login_data, password_matches
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -23,9 +24,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         )
 
     def create(self, validated_data):
-        user = User.objects.create_user(**validated_data)
-        user.update_refresh_token()
-        return user
+        return create_user(validated_data, make_password(validated_data.pop("password")))
 
 
 class UserLoginSerializer(serializers.Serializer):
@@ -36,33 +35,9 @@ class UserLoginSerializer(serializers.Serializer):
     refresh_token = serializers.CharField(max_length=255, read_only=True)
 
     def validate(self, data):
-        email = data.get(
-            "email",
-        )
-        password = data.get(
-            "password",
-        )
-
-        if not email:
-            raise serializers.ValidationError("An email address is required to log in.")
-
-        if not password:
-            raise serializers.ValidationError("A password is required to log in.")
-
-        user = authenticate(username=email, password=password)
-
-        if not user:
-            raise serializers.ValidationError("A user with this email and password was not found.")
-
-        if not user.is_active:
-            raise serializers.ValidationError("This user has been blocked.")
-
-        return {
-            "email": user.email,
-            "username": user.username,
-            "access_token": user.access_token,
-            "refresh_token": user.set_and_get_refresh_token,
-        }
+        user = User.objects.filter(email=data["email"]).first()
+        check_login(user, password_matches(data["password"], user.password if user else None))
+        return login_data(user)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -77,11 +52,9 @@ class UserSerializer(serializers.ModelSerializer):
             "title",
             "image_s3_path",
             "role",
-            "refresh_token",
             "is_blocked",
         )
         extra_kwargs = {
-            "refresh_token": {"read_only": True},
             "is_blocked": {"read_only": True},
             "role": {"read_only": True},
         }
@@ -1,13 +1,20 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
+from django.contrib.auth.hashers import check_password, make_password
 from django.shortcuts import get_object_or_404
-from rest_framework.exceptions import ValidationError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
 
-from apps.user.models import User
+from apps.user.models import RefreshToken, User
 from innotter import settings
 
 
 def upload_photo_to_s3(request):
-    user = request.user
+    user = get_object_or_404(User, pk=request.user.pk)
     image = request.FILES["image"]
     if not is_allowed_file_extension(file_path=image.name):
         raise ValidationError()
@@ -16,13 +23,59 @@ def upload_photo_to_s3(request):
 
     presigned_url = get_presigned_url(image=image, key=key)
 
-    us = get_object_or_404(User, pk=user.pk)
-    us.image_s3_path = presigned_url
-    us.save()
+    user.image_s3_path = presigned_url
+    user.save(update_fields=["image_s3_path"])
 
     return presigned_url
 
 
+class UserBlocked(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "You are blocked."
+
+
+def password_matches(password: str, password_hash: str = None) -> bool:
+    """Checks a login password, `password_hash` is None when no user has the login's email"""
+    if password_hash is None:
+        # Hash anyway, so unknown emails take as long as wrong passwords.
+        make_password(password)
+        return False
+    return check_password(password, password_hash)
+
+
+def check_login(user, is_valid_password: bool) -> None:
+    """Raises the error a login of `user` is refused with, `user` is None when the email is unknown"""
+    if user is not None and user.is_blocked:
+        raise UserBlocked()
+    if not is_valid_password:
+        raise ValidationError("A user with this email and password was not found.")
+    if not user.is_active:
+        raise ValidationError("This user has been blocked.")
+
+
+def login_data(user: User) -> dict:
+    """The response data of a successful login, issuing the device's refresh token and recording last_login"""
+    User.objects.filter(pk=user.pk).update(last_login=timezone.now())
+    return {
+        "email": user.email,
+        "username": user.username,
+        "access_token": user.access_token,
+        "refresh_token": user.issue_refresh_token(),
+    }
+
+
+def create_user(validated_data: dict, password_hash: str) -> User:
+    """Creates a registered user from its already hashed password and issues its first refresh token"""
+    validated_data = dict(validated_data)
+    email = User.objects.normalize_email(validated_data.pop("email"))
+    username = User.normalize_username(validated_data.pop("username"))
+    user = User(email=email, username=username, password=password_hash, **validated_data)
+    user.save()
+    # Only the hash is stored, the token itself is returned once in the response.
+    user.refresh_token = user.issue_refresh_token()
+    return user
+
+
 def get_presigned_url(image, key: str) -> str:
     s3_client = boto3.client(
         "s3",
@@ -45,3 +98,49 @@ def generate_file_name(file_path: str, key: str, is_user_image: bool) -> str:
     extension = file_path.split(".")[-1]
     prefix_folder = "users" if is_user_image else "pages"
     return f"{prefix_folder}/{key}.{extension}"
+
+
+def delete_expired_refresh_tokens(batch_size: int = 10000) -> int:
+    """Deletes expired refresh tokens in batches over the expires_at index, returns how many were deleted"""
+    expired = RefreshToken.objects.filter(expires_at__lte=timezone.now()).order_by("expires_at")
+    deleted = 0
+    while batch := list(expired.values_list("pk", flat=True)[:batch_size]):
+        deleted += RefreshToken.objects.filter(pk__in=batch).delete()[0]
+    return deleted
+
+
+class PasswordHashingBusy(Exception):
+    pass
+
+
+class PasswordHashingPool:
+    """Runs password hashing on a small dedicated thread pool, off the event loop.
+
+    PBKDF2 releases the GIL, so the threads hash in parallel while the loop keeps serving other requests.
+    At most `max_pending` hashings may be running or queued; beyond that run() fails fast with PasswordHashingBusy
+    instead of letting a login storm queue up without bound.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = None
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PasswordHashingBusy()
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hashing")
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+password_hashing_pool = PasswordHashingPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE_SIZE)
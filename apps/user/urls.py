@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import SimpleRouter
 from rest_framework.urlpatterns import format_suffix_patterns
 
+from apps.user.utils import AsyncLoginView, AsyncRegisterView
 from apps.user.views import UserViewSet
 
 router = SimpleRouter()
@@ -9,6 +10,9 @@ router.register("users", UserViewSet)
 
 app_name = "Users"
 urlpatterns = [
+    # ASGI-only login/register, served with the password hashing pool
+    path("users/async/login/", AsyncLoginView.as_view(), name="async-login"),
+    path("users/async/register/", AsyncRegisterView.as_view(), name="async-register"),
     path("", include(router.urls)),
 ]
 
@@ -1,10 +1,18 @@
-from datetime import datetime
+import json
 
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.mixins import DestroyModelMixin, ListModelMixin, RetrieveModelMixin, UpdateModelMixin
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.serializers import as_serializer_error
 from rest_framework.viewsets import GenericViewSet
 
 from apps.page.permissions import IsAdminOrModerator
@@ -16,7 +24,16 @@ from apps.user.serializers import (
     UserSerializer,
     UserUploadAvatarSerializer,
 )
-from apps.user.services import upload_photo_to_s3
+from apps.user.services import (
+    PasswordHashingBusy,
+    UserBlocked,
+    check_login,
+    create_user,
+    login_data,
+    password_hashing_pool,
+    password_matches,
+    upload_photo_to_s3,
+)
 from innotter.basic_mixin import GetPermissionsMixin, GetSerializerMixin
 
 
@@ -100,15 +117,6 @@ class UserMixin(
         user = request.data.get(
             "user",
         )
-        user_model = User.objects.get(email=user["email"])
-
-        if user_model.is_blocked:
-            return Response(
-                {"detail": "You are blocked."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        user_model.last_login = datetime.now()
-        user_model.save()
 
         serializer = self.get_serializer(data=user)
         serializer.is_valid(raise_exception=True)
@@ -178,3 +186,74 @@ class UserMixin(
         image_s3_path = upload_photo_to_s3(request)
 
         return Response(image_s3_path, status=status.HTTP_200_OK)
+
+
+def _request_user_data(request) -> dict:
+    try:
+        return json.loads(request.body).get("user") or {}
+    except (ValueError, AttributeError):
+        return {}
+
+
+def _error_response(message, status_code=status.HTTP_400_BAD_REQUEST):
+    return JsonResponse({"non_field_errors": [message]}, status=status_code)
+
+
+def _busy_response():
+    response = _error_response("Too many logins right now, try again.", status.HTTP_503_SERVICE_UNAVAILABLE)
+    response["Retry-After"] = "1"
+    return response
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncLoginView(View):
+    """ASGI version of UserMixin.login, checking the password on the password hashing pool"""
+
+    async def post(self, request):
+        try:
+            # Only the field validation of UserLoginSerializer, its validate() would hash on this thread.
+            credentials = UserLoginSerializer().to_internal_value(_request_user_data(request))
+        except ValidationError as e:
+            return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        user = await User.objects.filter(email=credentials["email"]).afirst()
+        try:
+            is_valid_password = await password_hashing_pool.run(
+                password_matches, credentials["password"], user.password if user else None
+            )
+        except PasswordHashingBusy:
+            return _busy_response()
+
+        try:
+            check_login(user, is_valid_password)
+        except ValidationError as e:
+            return JsonResponse(as_serializer_error(e), status=e.status_code)
+        except UserBlocked as e:
+            return JsonResponse({"detail": e.detail}, status=e.status_code)
+
+        data = await sync_to_async(login_data)(user)
+        response = JsonResponse(UserLoginSerializer(data).data, status=status.HTTP_200_OK)
+        response.set_cookie("access_token", data["access_token"], httponly=True)
+        response.set_cookie("refresh_token", data["refresh_token"], httponly=True)
+
+        return response
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncRegisterView(View):
+    """ASGI version of UserMixin.register, hashing the password on the password hashing pool"""
+
+    async def post(self, request):
+        serializer = UserRegistrationSerializer(data=_request_user_data(request))
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = dict(serializer.validated_data)
+        try:
+            password_hash = await password_hashing_pool.run(make_password, validated_data.pop("password"))
+        except PasswordHashingBusy:
+            return _busy_response()
+
+        user = await sync_to_async(create_user)(validated_data, password_hash)
+
+        return JsonResponse(UserRegistrationSerializer(user).data, status=status.HTTP_201_CREATED)
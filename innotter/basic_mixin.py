@@ -10,3 +10,18 @@ class GetPermissionsMixin:
     def get_permissions(self):
         permission_classes = self.permission_classes.get(self.action, IsAuthenticated)
         return [permission() for permission in permission_classes]
+
+
+class EagerLoadingMixin:
+    def eager_load(self, queryset):
+        """Loads the relations rendered by the current action's serializer, as declared by its setup_eager_loading()"""
+        setup_eager_loading = getattr(self.get_serializer_class(), "setup_eager_loading", None)
+        return setup_eager_loading(queryset) if setup_eager_loading else queryset
+
+
+class PaginatedActionMixin:
+    def paginated_response(self, queryset):
+        """Serializes one page of `queryset` for list-like extra actions, the way ListModelMixin.list does"""
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
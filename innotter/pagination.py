@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+from innotter import settings
+
+
+class KeysetPagination(CursorPagination):
+    """Opaque-cursor pagination over an indexed, unique ordering, so every page costs the same to fetch"""
+
+    page_size = settings.PAGINATION_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+    ordering = "id"
+
+
+class NewestFirstPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
@@ -28,11 +28,13 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "apps.user.apps.UserConfig",
     "apps.page.apps.PageConfig",
     "apps.post.apps.PostConfig",
     "apps.tag.apps.TagConfig",
     "apps.like.apps.LikeConfig",
+    "apps.outbox.apps.OutboxConfig",
     "rest_framework",
     "jwt",
 ]
@@ -86,6 +88,25 @@ RABBITMQ_PASS = os.getenv("RABBITMQ_PASS")
 RABBITMQ_PORT = os.getenv("RABBITMQ_PORT")
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
 RABBIT_QUEUE_NAME = os.getenv("RABBIT_QUEUE_NAME")
+RABBITMQ_HEARTBEAT = int(os.getenv("RABBITMQ_HEARTBEAT", 60))
+RABBITMQ_BLOCKED_CONNECTION_TIMEOUT = int(os.getenv("RABBITMQ_BLOCKED_CONNECTION_TIMEOUT", 30))
+# "sync" publishes on the calling thread, "background" hands messages to an in-process publishing thread.
+RABBITMQ_PUBLISH_MODE = os.getenv("RABBITMQ_PUBLISH_MODE", "sync")
+RABBITMQ_PUBLISH_QUEUE_SIZE = int(os.getenv("RABBITMQ_PUBLISH_QUEUE_SIZE", 10000))
+RABBITMQ_PUBLISH_BATCH_SIZE = int(os.getenv("RABBITMQ_PUBLISH_BATCH_SIZE", 100))
+# What to do with a message when the background queue is full: "block", or "drop" and leave it to the outbox relay.
+RABBITMQ_PUBLISH_OVERFLOW = os.getenv("RABBITMQ_PUBLISH_OVERFLOW", "block")
+RABBITMQ_PUBLISH_FLUSH_TIMEOUT = float(os.getenv("RABBITMQ_PUBLISH_FLUSH_TIMEOUT", 5))
+
+OUTBOX_RELAY_BATCH_SIZE = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", 500))
+OUTBOX_RELAY_INTERVAL = float(os.getenv("OUTBOX_RELAY_INTERVAL", 0.5))
+# In background mode events are published right after commit, the relay only picks up rows older than this.
+OUTBOX_RELAY_DELAY = float(os.getenv("OUTBOX_RELAY_DELAY", 10 if RABBITMQ_PUBLISH_MODE == "background" else 0))
+# Seconds the relay leaves an event claimed by the background publisher alone before it takes it over.
+OUTBOX_CLAIM_TTL = float(os.getenv("OUTBOX_CLAIM_TTL", 60))
+
+STATISTICS_REBUILD_CHUNK_SIZE = int(os.getenv("STATISTICS_REBUILD_CHUNK_SIZE", 2000))
+STATISTICS_REBUILD_WORKERS = int(os.getenv("STATISTICS_REBUILD_WORKERS", 8))
 
 CELERY_BROKER_URL = f"amqp://{RABBITMQ_USER}:{RABBITMQ_PASS}@{RABBITMQ_HOST}:{RABBITMQ_PORT}"
 
@@ -97,6 +118,7 @@ AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
 AWS_DEFAULT_REGION = os.environ.get('AWS_DEFAULT_REGION')
 AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME')
 AWS_S3_FILE_OVERWRITE = False
+AWS_DYNAMODB_TABLE_NAME = os.environ.get('AWS_DYNAMODB_TABLE_NAME')
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 ALLOWED_FILE_EXTENSIONS = (
     'jpeg',
@@ -105,6 +127,17 @@ ALLOWED_FILE_EXTENSIONS = (
 
 AUTH_USER_MODEL = "user.User"
 
+# Embeds role and block status in access tokens and authenticates without loading the user; changes to them
+# then take effect when the token expires.
+AUTH_STATELESS = int(os.getenv("AUTH_STATELESS", 0))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+# Upper bound on how long other processes may keep authenticating a blocked or changed user.
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", 60))
+
+# Password hashing pool of the async login/register views, logins beyond the queue size get a 503.
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", 4))
+PASSWORD_HASHING_QUEUE_SIZE = int(os.getenv("PASSWORD_HASHING_QUEUE_SIZE", 32))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -144,4 +177,8 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     # "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_AUTHENTICATION_CLASSES": ("apps.user.backends.JWTAuthentication",),
+    "DEFAULT_PAGINATION_CLASS": "innotter.pagination.KeysetPagination",
 }
+PAGINATION_PAGE_SIZE = int(os.getenv("PAGINATION_PAGE_SIZE", 50))
+PAGINATION_MAX_PAGE_SIZE = int(os.getenv("PAGINATION_MAX_PAGE_SIZE", 200))
+PAGE_FOLLOWERS_PREVIEW_SIZE = int(os.getenv("PAGE_FOLLOWERS_PREVIEW_SIZE", 5))
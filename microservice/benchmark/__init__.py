@@ -0,0 +1,21 @@
+"""Offline consumer benchmark: `python -m microservice.benchmark --help`.
+
+Synthetic events go through the real consume() dispatch, with RabbitMQ and DynamoDB replaced by the in-memory
+stand-ins from `stubs`. The settings the stand-ins make irrelevant get placeholder values, so no .env is needed.
+"""
+import os
+
+for name, value in {
+    "RABBITMQ_USER": "benchmark",
+    "RABBITMQ_PASS": "benchmark",
+    "RABBITMQ_HOST": "localhost",
+    "RABBITMQ_PORT": "5672",
+    "RABBIT_QUEUE_NAME": "statistics-benchmark",
+    "AWS_URL": "http://localhost",
+    "AWS_DEFAULT_REGION": "us-west-2",
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "AWS_DYNAMODB_TABLE_NAME": "statistics-benchmark",
+    "SECRET_KEY": "benchmark",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+import logging
+
+from microservice.benchmark.runner import DEFAULT_MIX, BenchmarkConfig, run_benchmark
+from microservice.benchmark.stubs import Latency
+
+
+def parse_mix(value: str) -> dict:
+    """Parses "like=5,post=2" into relative weights of the event kinds"""
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown event kind {kind!r}, expected one of {', '.join(DEFAULT_MIX)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m microservice.benchmark", description=__doc__)
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument(
+        "--mix", type=parse_mix, default=DEFAULT_MIX, help="Relative weights of the event kinds, e.g. like=5,page=1"
+    )
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of the page popularity, 0 is uniform")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="Share of redelivered events")
+    parser.add_argument("--write-latency", type=float, default=0.005, help="Seconds per DynamoDB call")
+    parser.add_argument("--write-jitter", type=float, default=0.0)
+    parser.add_argument("--delivery-latency", type=float, default=0.0, help="Seconds per delivered message")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    config = BenchmarkConfig(
+        events=args.events,
+        pages=args.pages,
+        mix=args.mix,
+        skew=args.skew,
+        duplicate_rate=args.duplicate_rate,
+        write_latency=Latency(args.write_latency, args.write_jitter),
+        delivery_latency=Latency(args.delivery_latency),
+        seed=args.seed,
+    )
+    result = asyncio.run(run_benchmark(config))
+    print(result.report())
+
+
+if __name__ == "__main__":
+    main()
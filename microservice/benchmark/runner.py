@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+import msgpack
+
+from microservice import consumer
+from microservice.benchmark.stubs import Latency, MemoryBroker, MemoryQueue, MemoryTable
+from microservice.retry import REASON_HEADER
+from microservice.services.dynamodb import dynamodb
+from microservice.services.page_service import CommandTypes
+from microservice.settings import settings
+
+DEFAULT_MIX = {"like": 5, "post": 2, "follower": 2, "page": 1}
+
+# Event types of each kind with their relative weights, mostly creations like in production.
+EVENT_TYPES = {
+    "like": {CommandTypes.CREATE_LIKE: 4, CommandTypes.DELETE_LIKE: 1},
+    "post": {CommandTypes.CREATE_POST: 4, CommandTypes.DELETE_POST: 1},
+    "follower": {CommandTypes.ADD_FOLLOWER: 6, CommandTypes.DELETE_FOLLOWER: 2, CommandTypes.ADD_ALL_FOLLOWERS: 1},
+    "page": {CommandTypes.UPDATE_PAGE: 1},
+}
+COUNTER_DELTAS = {
+    CommandTypes.CREATE_LIKE: ("amount_of_likes", 1),
+    CommandTypes.DELETE_LIKE: ("amount_of_likes", -1),
+    CommandTypes.CREATE_POST: ("amount_of_posts", 1),
+    CommandTypes.DELETE_POST: ("amount_of_posts", -1),
+    CommandTypes.ADD_FOLLOWER: ("amount_of_followers", 1),
+    CommandTypes.DELETE_FOLLOWER: ("amount_of_followers", -1),
+}
+
+
+@dataclass
+class BenchmarkConfig:
+    events: int = 10000
+    pages: int = 1000
+    mix: dict = field(default_factory=lambda: dict(DEFAULT_MIX))
+    skew: float = 1.0
+    duplicate_rate: float = 0.0
+    write_latency: Latency = field(default_factory=Latency)
+    delivery_latency: Latency = field(default_factory=Latency)
+    seed: int = 0
+
+
+@dataclass
+class BenchmarkResult:
+    events: int
+    seconds: float
+    latencies: list
+    statistics_writes: int
+    dedup_writes: int
+    counters_match: bool
+    failed: int
+    leased: int
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.events / self.seconds if self.seconds else 0
+
+    def latency_percentile(self, percentile: float) -> float:
+        if not self.latencies:
+            return 0
+        return self.latencies[min(len(self.latencies) - 1, int(percentile / 100 * len(self.latencies)))]
+
+    @property
+    def write_amplification(self) -> float:
+        """Statistics table writes per event, below 1 when counter deltas are coalesced"""
+        return self.statistics_writes / self.events if self.events else 0
+
+    def report(self) -> str:
+        return "\n".join(
+            (
+                f"events:              {self.events} ({self.failed} failed, {self.leased} retried while leased)",
+                f"throughput:          {self.messages_per_second:,.0f} msgs/sec",
+                f"handler latency p50: {self.latency_percentile(50) * 1000:.2f} ms",
+                f"handler latency p99: {self.latency_percentile(99) * 1000:.2f} ms",
+                f"write amplification: {self.write_amplification:.3f} statistics writes/event",
+                f"dedup writes:        {self.dedup_writes / self.events if self.events else 0:.3f} per event",
+                f"counters match:      {'yes' if self.counters_match else 'NO'}",
+            )
+        )
+
+
+class EventStream:
+    """Synthetic events over `pages` pages whose popularity follows a Zipf law with exponent `skew` (0 is uniform)"""
+
+    def __init__(self, config: BenchmarkConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        weights = [1 / rank**config.skew for rank in range(1, config.pages + 1)]
+        self._page_weights = list(itertools.accumulate(weights))
+        self._kinds = list(config.mix)
+        self._kind_weights = list(itertools.accumulate(config.mix[kind] for kind in self._kinds))
+        self.expected = defaultdict(Counter)
+
+    def __iter__(self):
+        sent = []
+        for _ in range(self.config.events):
+            if sent and self.random.random() < self.config.duplicate_rate:
+                # A redelivery keeps the id of the original, the consumer must skip it.
+                yield self.random.choice(sent)
+                continue
+            event = self._new_event()
+            sent.append(event)
+            yield event
+
+    def _new_event(self) -> tuple:
+        page_id = self.random.choices(range(1, self.config.pages + 1), cum_weights=self._page_weights)[0]
+        kind = self.random.choices(self._kinds, cum_weights=self._kind_weights)[0]
+        event_types = EVENT_TYPES[kind]
+        event_type = self.random.choices(list(event_types), weights=list(event_types.values()))[0]
+
+        if event_type == CommandTypes.ADD_ALL_FOLLOWERS:
+            quantity = self.random.randint(1, 20)
+            data = {"page_id": page_id, "quantity": quantity}
+            self.expected[page_id]["amount_of_followers"] += quantity
+        elif event_type == CommandTypes.UPDATE_PAGE:
+            data = {"id": page_id, "owner": page_id % 97, "name": f"page {page_id}", "description": uuid.uuid4().hex}
+        else:
+            data = page_id
+            counter, delta = COUNTER_DELTAS[event_type]
+            self.expected[page_id][counter] += delta
+
+        event_id = uuid.uuid4().hex
+        body = msgpack.packb({"id": event_id, "type": event_type.value, "v": consumer.EVENT_VERSION, "data": data})
+        return body, event_id, event_type.value
+
+
+async def run_benchmark(config: BenchmarkConfig) -> BenchmarkResult:
+    """Runs the events of `config` through consume() against the in-memory broker and tables"""
+    stream = EventStream(config)
+    queue = MemoryQueue(settings.RABBIT_QUEUE_NAME, config.delivery_latency)
+    for body, event_id, event_type in stream:
+        queue.add(body, consumer.EVENT_CONTENT_TYPE, event_id, event_type)
+
+    statistics_table = MemoryTable("page_id", config.write_latency)
+    dedup_table = MemoryTable("event_id", config.write_latency)
+    for page_id in range(1, config.pages + 1):
+        statistics_table.items[page_id] = {
+            "page_id": page_id,
+            "counters": {"amount_of_posts": 0, "amount_of_likes": 0, "amount_of_followers": 0},
+        }
+
+    dynamodb.table, dynamodb.dedup_table = statistics_table, dedup_table
+    broker = MemoryBroker(queue)
+    consumer.connect_robust = broker.connect
+
+    started_at = time.monotonic()
+    await consumer.consume(asyncio.get_running_loop())
+    seconds = time.monotonic() - started_at
+    reasons = [message.headers[REASON_HEADER] for _, message in broker.memory_channel.republished]
+
+    return BenchmarkResult(
+        events=len(queue.messages),
+        seconds=seconds,
+        latencies=sorted(message.settled_at - message.delivered_at for message in queue.messages),
+        statistics_writes=statistics_table.writes,
+        dedup_writes=dedup_table.writes,
+        counters_match=all(
+            statistics_table.items[page_id]["counters"].get(counter, 0) == value
+            for page_id, counters in stream.expected.items()
+            for counter, value in counters.items()
+        ),
+        # Failed messages are acked once the retry router has moved them to a retry or dead letter queue.
+        failed=sum(reason != "leased" for reason in reasons),
+        # Duplicates delivered while their original still held the lease.
+        leased=sum(reason == "leased" for reason in reasons),
+    )
@@ -0,0 +1,179 @@
+import asyncio
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from types import SimpleNamespace
+
+import botocore.exceptions
+
+
+class Latency:
+    """Injected delay of `mean` seconds, spread uniformly by +-`jitter` seconds"""
+
+    def __init__(self, mean: float = 0, jitter: float = 0):
+        self.mean = mean
+        self.jitter = jitter
+
+    async def wait(self):
+        delay = self.mean + random.uniform(-self.jitter, self.jitter) if self.jitter else self.mean
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class MemoryTable:
+    """Stand-in for an aioboto3 DynamoDB Table with the subset of the API the consumer uses.
+
+    put_item honours the "attribute_not_exists ... OR expires_at < :now" condition of the dedup store, update_item
+    applies the "ADD counters.x" and "SET" expressions of the page service and the dedup store. Every call is counted
+    and delayed by `latency`.
+    """
+
+    def __init__(self, key: str, latency: Latency = None):
+        self.key = key
+        self.latency = latency or Latency()
+        self.items = {}
+        self.calls = Counter()
+
+    @property
+    def writes(self) -> int:
+        return self.calls["put_item"] + self.calls["update_item"] + self.calls["delete_item"]
+
+    async def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None):
+        await self._call("put_item")
+        key = Item[self.key]
+        existing = self.items.get(key)
+        now = (ExpressionAttributeValues or {}).get(":now")
+        if ConditionExpression and existing is not None and (now is None or existing.get("expires_at", now) >= now):
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "ConditionalCheckFailedException", "Message": "The conditional request failed"}},
+                "PutItem",
+            )
+        self.items[key] = dict(Item)
+
+    async def get_item(self, Key, ConsistentRead=False):
+        await self._call("get_item")
+        item = self.items.get(Key[self.key])
+        return {"Item": dict(item)} if item is not None else {}
+
+    async def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ExpressionAttributeNames=None):
+        await self._call("update_item")
+        item = self.items.setdefault(Key[self.key], dict(Key))
+        names = ExpressionAttributeNames or {}
+        action, _, assignments = UpdateExpression.partition(" ")
+        for assignment in assignments.split(", "):
+            if action == "ADD":
+                path, value = assignment.split(" ")
+                *parents, name = path.split(".")
+                target = item
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[name] = target.get(name, 0) + ExpressionAttributeValues[value]
+            else:
+                name, value = re.split(r"\s*=\s*", assignment)
+                item[names.get(name, name)] = ExpressionAttributeValues[value]
+
+    async def delete_item(self, Key):
+        await self._call("delete_item")
+        self.items.pop(Key[self.key], None)
+
+    async def _call(self, operation: str):
+        self.calls[operation] += 1
+        await self.latency.wait()
+
+
+class MemoryMessage:
+    """Stand-in for aio_pika's IncomingMessage that records when it was delivered and settled"""
+
+    def __init__(self, body: bytes, content_type: str, message_id: str, event_type: str, on_settle):
+        self.body = body
+        self.content_type = content_type
+        self.message_id = message_id
+        self.type = event_type
+        self.headers = {}
+        self.timestamp = datetime.now()
+        self.properties = SimpleNamespace(content_type=content_type, message_id=message_id)
+        self.delivered_at = None
+        self.settled_at = None
+        self.acked = False
+        self._on_settle = on_settle
+
+    async def ack(self):
+        self.acked = True
+        self._settle()
+
+    async def nack(self, requeue: bool = True):
+        self._settle()
+
+    def _settle(self):
+        self.settled_at = time.monotonic()
+        self._on_settle()
+
+
+class MemoryQueue:
+    """Delivers a fixed list of messages, keeping at most `prefetch_count` of them unacked like the broker does"""
+
+    def __init__(self, name: str, latency: Latency = None):
+        self.name = name
+        self.latency = latency or Latency()
+        self.messages = []
+        self.prefetch = None
+
+    def add(self, body: bytes, content_type: str, message_id: str, event_type: str) -> MemoryMessage:
+        message = MemoryMessage(body, content_type, message_id, event_type, on_settle=lambda: self.prefetch.release())
+        self.messages.append(message)
+        return message
+
+    def iterator(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        for message in self.messages:
+            await self.prefetch.acquire()
+            await self.latency.wait()
+            message.delivered_at = time.monotonic()
+            yield message
+
+
+class MemoryChannel:
+    def __init__(self, queue: MemoryQueue):
+        self.queue = queue
+        self.declared = []
+        self.republished = []
+        self.default_exchange = SimpleNamespace(publish=self._publish)
+
+    async def set_qos(self, prefetch_count: int):
+        self.queue.prefetch = asyncio.Semaphore(prefetch_count)
+
+    async def declare_queue(self, name: str, **kwargs):
+        self.declared.append(name)
+        return self.queue if name == self.queue.name else SimpleNamespace(name=name)
+
+    async def _publish(self, message, routing_key: str):
+        self.republished.append((routing_key, message))
+
+
+class MemoryBroker:
+    """Replaces aio_pika.connect_robust: every connection serves the one in-memory queue"""
+
+    def __init__(self, queue: MemoryQueue):
+        self.memory_channel = MemoryChannel(queue)
+
+    async def connect(self, url: str, loop=None):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def channel(self):
+        return self.memory_channel
@@ -1,9 +1,19 @@
+import asyncio
+import contextlib
 import json
+import logging
+import time
 
+import msgpack
 from aio_pika import connect_robust
-from aio_pika.abc import AbstractChannel, AbstractQueue
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage, AbstractQueue
 
+from microservice.metrics import HANDLER_LATENCY, IN_FLIGHT, MESSAGES, observe_processed
+from microservice.retry import RetryRouter
+from microservice.services.dedup import Claim, EventLeased, dedup_store
 from microservice.services.page_service import (
+    CommandTypes,
+    counter_aggregator,
     page_statistics_data,
     update_followers_counter,
     update_likes_counter,
@@ -11,8 +21,153 @@ from microservice.services.page_service import (
 )
 from microservice.settings import settings
 
+logger = logging.getLogger(__name__)
 
-async def consume(loop):
+EVENT_CONTENT_TYPE = "application/x-msgpack"
+EVENT_VERSION = 1
+
+
+def get_page_id(data) -> int:
+    if isinstance(data, dict):
+        return int(data.get("page_id", data.get("id")))
+    return int(data)
+
+
+def decode_message(message: AbstractIncomingMessage) -> tuple:
+    """Returns the id, type and payload of an event, also accepting the legacy JSON messages"""
+    if message.properties.content_type == EVENT_CONTENT_TYPE:
+        envelope = msgpack.unpackb(message.body)
+        if envelope["v"] > EVENT_VERSION:
+            raise ValueError(f"Unsupported {envelope['type']} event version {envelope['v']}")
+        return envelope.get("id"), envelope["type"], envelope["data"]
+    # Legacy messages carry the event type in content_type and a JSON body.
+    return message.properties.message_id, message.properties.content_type, json.loads(message.body)
+
+
+async def handle_page_event(event_type: str, data):
+    # Page writes must not overtake the counter deltas of the same page that arrived before them.
+    await counter_aggregator.flush()
+    await page_statistics_data(event_type, data)
+
+
+async def handle_post_event(event_type: str, data) -> asyncio.Future:
+    return update_posts_counter(page_id=int(data), field=event_type)
+
+
+async def handle_like_event(event_type: str, data) -> asyncio.Future:
+    return update_likes_counter(page_id=int(data), field=event_type)
+
+
+async def handle_follower_event(event_type: str, data) -> asyncio.Future:
+    return update_followers_counter(data=data, field=event_type)
+
+
+EVENT_HANDLERS = {
+    CommandTypes.CREATE_PAGE: handle_page_event,
+    CommandTypes.UPDATE_PAGE: handle_page_event,
+    CommandTypes.DELETE_PAGE: handle_page_event,
+    CommandTypes.CREATE_POST: handle_post_event,
+    CommandTypes.DELETE_POST: handle_post_event,
+    CommandTypes.CREATE_LIKE: handle_like_event,
+    CommandTypes.DELETE_LIKE: handle_like_event,
+    CommandTypes.ADD_FOLLOWER: handle_follower_event,
+    CommandTypes.DELETE_FOLLOWER: handle_follower_event,
+    CommandTypes.ADD_ALL_FOLLOWERS: handle_follower_event,
+}
+
+
+async def handle_message(event_type: str, data) -> asyncio.Future | None:
+    """Handles one event. Counter events only register their delta and return a future resolved once it's saved"""
+    handler = EVENT_HANDLERS.get(event_type)
+    if handler is None:
+        logger.warning("Skipping unknown %s event", event_type)
+        return None
+    return await handler(event_type, data)
+
+
+def record_outcome(message: AbstractIncomingMessage, event_type: str, received_at: float, outcome: str):
+    IN_FLIGHT.dec()
+    event_type = event_type if event_type in EVENT_HANDLERS else "unknown"
+    if outcome != "processed":
+        MESSAGES.labels(event_type, outcome).inc()
+        return
+
+    HANDLER_LATENCY.labels(event_type).observe(time.monotonic() - received_at)
+    # Messages published before the producer set timestamps count as published just now.
+    observe_processed(event_type, message.timestamp.timestamp() if message.timestamp else time.time())
+
+
+async def settle(
+    message: AbstractIncomingMessage,
+    event_id,
+    event_type: str,
+    received_at: float,
+    saved: asyncio.Future | None,
+    router: RetryRouter,
+):
+    try:
+        if saved is not None:
+            await saved
+    except Exception as e:
+        logger.exception("Failed to handle %s event", event_type)
+        await fail(message, event_id, e, router)
+        record_outcome(message, event_type, received_at, "failed")
+    else:
+        if event_id:
+            await complete(event_id)
+        await message.ack()
+        record_outcome(message, event_type, received_at, "processed")
+
+
+async def complete(event_id):
+    # The writes are saved, so a failure here must not route the event for a retry; the lease still covers it.
+    try:
+        await dedup_store.complete(event_id)
+    except Exception:
+        logger.exception("Failed to complete event %s", event_id)
+
+
+async def fail(message: AbstractIncomingMessage, event_id, error: Exception, router: RetryRouter):
+    try:
+        if event_id:
+            await dedup_store.release(event_id)
+    except Exception:
+        logger.exception("Failed to release event %s", event_id)
+    await router.route(message, error)
+
+
+async def process_lane(lane: asyncio.Queue, settling: set, router: RetryRouter):
+    """Handles the messages of one lane in order. A message is acked only once its handler's writes are saved"""
+    while True:
+        message, event_id, event_type, data, received_at = await lane.get()
+        try:
+            claim = await dedup_store.claim(event_id) if event_id else Claim.CLAIMED
+            if claim is Claim.DONE:
+                logger.info("Skipping duplicate %s event %s", event_type, event_id)
+                await message.ack()
+                record_outcome(message, event_type, received_at, "duplicate")
+                continue
+            if claim is Claim.LEASED:
+                # Its writes may not be saved yet, so retry it until the lease is completed or expires.
+                logger.info("Retrying %s event %s leased to another consumer", event_type, event_id)
+                await router.route(message, EventLeased(event_id))
+                record_outcome(message, event_type, received_at, "leased")
+                continue
+            saved = await handle_message(event_type, data)
+        except Exception as e:
+            logger.exception("Failed to handle %s event", event_type)
+            await fail(message, event_id, e, router)
+            record_outcome(message, event_type, received_at, "failed")
+        else:
+            task = asyncio.create_task(settle(message, event_id, event_type, received_at, saved, router))
+            settling.add(task)
+            task.add_done_callback(settling.discard)
+        finally:
+            lane.task_done()
+
+
+async def consume(loop, stop: asyncio.Event | None = None):
+    """Consumes events until the queue iterator ends or `stop` is set, then settles the messages already received"""
     connection = await connect_robust(
         f"amqp://{settings.RABBITMQ_USER}:{settings.RABBITMQ_PASS}@{settings.RABBITMQ_HOST}:{settings.RABBITMQ_PORT}/",
         loop=loop,
@@ -20,34 +175,49 @@ async def consume(loop):
 
     async with connection:
         channel: AbstractChannel = await connection.channel()
+        await channel.set_qos(prefetch_count=settings.RABBIT_PREFETCH_COUNT)
 
         queue: AbstractQueue = await channel.declare_queue(
             settings.RABBIT_QUEUE_NAME,
         )
+        router = RetryRouter(channel, queue.name)
+        await router.declare()
+
+        # Events of one page always land in the same lane, so they keep their order
+        # while different pages are handled concurrently.
+        lanes = [asyncio.Queue() for _ in range(settings.CONSUMER_LANES)]
+        settling = set()
+        workers = [asyncio.create_task(process_lane(lane, settling, router)) for lane in lanes]
+
+        async def receive():
+            async with queue.iterator() as queue_iter:
+                message: AbstractIncomingMessage
+                async for message in queue_iter:
+                    try:
+                        event_id, event_type, data = decode_message(message)
+                        lane = lanes[get_page_id(data) % len(lanes)]
+                    except Exception as e:
+                        logger.exception("Failed to decode a message")
+                        await router.route(message, e)
+                        continue
+                    lane.put_nowait((message, event_id, event_type, data, time.monotonic()))
+                    IN_FLIGHT.inc()
+
+        receiving = asyncio.create_task(receive())
+        stopping = asyncio.create_task((stop or asyncio.Event()).wait())
+        try:
+            await asyncio.wait((receiving, stopping), return_when=asyncio.FIRST_COMPLETED)
+            # Stops the broker deliveries, the unacked messages that never reached a lane are redelivered.
+            receiving.cancel()
+            stopping.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await receiving
 
-        async with queue.iterator() as queue_iter:
-            async for message in queue_iter:
-                async with message.process():
-                    data = json.loads(message.body)
-
-                    match message.properties.content_type.split("_")[0]:
-                        case "like":
-                            await update_likes_counter(
-                                page_id=int(data),
-                                field=message.properties.content_type,
-                            ),
-                        case "page":
-                            await page_statistics_data(message.properties.content_type, data),
-                        case "post":
-                            await update_posts_counter(
-                                page_id=int(data),
-                                field=message.properties.content_type,
-                            ),
-                        case "follower":
-                            await update_followers_counter(
-                                data=data,
-                                field=message.properties.content_type,
-                            )
-
-                    if queue.name in message.body.decode():
-                        break
+            await asyncio.gather(*(lane.join() for lane in lanes))
+            await counter_aggregator.flush()
+            await asyncio.gather(*settling)
+        finally:
+            receiving.cancel()
+            stopping.cancel()
+            for worker in workers:
+                worker.cancel()
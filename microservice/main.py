@@ -1,22 +1,41 @@
 import asyncio
 
 import uvicorn
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from microservice.consumer import consume
 from microservice.jwt_auth import has_access
 from microservice.routes.page_statistics_routes import router
-from microservice.services.page_service import create_table
+from microservice.services.dynamodb import dynamodb
+from microservice.services.page_service import create_dedup_table, create_table
 
 app = FastAPI()
 app.include_router(router, tags=["pages"], prefix="", dependencies=[Depends(has_access)])
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.on_event("startup")
 async def startup_event():
-    loop = asyncio.get_event_loop()
-    asyncio.ensure_future(consume(loop))
+    await dynamodb.open()
     await create_table()
+    await create_dedup_table()
+    loop = asyncio.get_event_loop()
+    app.state.consumer_stop = asyncio.Event()
+    app.state.consumer = asyncio.ensure_future(consume(loop, app.state.consumer_stop))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.consumer_stop.set()
+    try:
+        await app.state.consumer
+    finally:
+        await dynamodb.close()
 
 
 if __name__ == "__main__":
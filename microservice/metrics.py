@@ -0,0 +1,36 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+MESSAGES = Counter(
+    "statistics_messages_total",
+    "Statistics events taken off the queue, by type and outcome",
+    ["event_type", "outcome"],
+)
+HANDLER_LATENCY = Histogram(
+    "statistics_handler_seconds",
+    "Time from picking an event up until it is saved and acked",
+    ["event_type"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DYNAMODB_LATENCY = Histogram(
+    "statistics_dynamodb_seconds",
+    "DynamoDB call latency",
+    ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+FAILURES = Counter("statistics_failures_total", "Failed statistics events, by reason", ["reason"])
+IN_FLIGHT = Gauge("statistics_messages_in_flight", "Statistics events received but not acked yet")
+LAST_EVENT_TIMESTAMP = Gauge(
+    "statistics_last_event_timestamp_seconds", "Publish time of the most recently processed event"
+)
+LAST_EVENT_AGE = Gauge(
+    "statistics_last_event_age_seconds", "Age of the most recently processed event when it was acked"
+)
+
+
+def observe_processed(event_type: str, published_at: float):
+    now = time.time()
+    MESSAGES.labels(event_type, "processed").inc()
+    LAST_EVENT_TIMESTAMP.set(published_at)
+    LAST_EVENT_AGE.set(now - published_at)
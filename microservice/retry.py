@@ -0,0 +1,91 @@
+import logging
+
+import botocore.exceptions
+from aio_pika import Message
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage
+
+from microservice.metrics import FAILURES
+from microservice.services.dedup import EventLeased
+from microservice.settings import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_HEADER = "x-retry-attempt"
+REASON_HEADER = "x-failure-reason"
+THROTTLING_ERRORS = (
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "ThrottlingException",
+)
+
+
+def failure_reason(error: Exception) -> str:
+    if isinstance(error, EventLeased):
+        return "leased"
+    if isinstance(error, botocore.exceptions.ClientError):
+        if error.response["Error"]["Code"] in THROTTLING_ERRORS:
+            return "throttled"
+        return "dynamodb"
+    if isinstance(error, (ValueError, KeyError, TypeError)):
+        # Undecodable or invalid payloads fail the same way on every attempt.
+        return "invalid"
+    return "error"
+
+
+class RetryRouter:
+    """Moves failed messages off the main queue instead of rejecting them.
+
+    Attempt n waits in the "<queue>.retry.<n>" queue, whose TTL grows exponentially, and is then dead-lettered
+    back to the main queue. Invalid messages and messages out of attempts go to "<queue>.dead". Leased events are
+    never dead-lettered, they keep waiting in the last retry queue until their lease is completed or expires.
+    """
+
+    def __init__(self, channel: AbstractChannel, queue_name: str):
+        self.channel = channel
+        self.queue_name = queue_name
+        self.dead_letter_queue_name = f"{queue_name}.dead"
+
+    def retry_queue_name(self, attempt: int) -> str:
+        return f"{self.queue_name}.retry.{attempt}"
+
+    async def declare(self):
+        for attempt in range(settings.CONSUMER_MAX_RETRIES):
+            await self.channel.declare_queue(
+                self.retry_queue_name(attempt),
+                arguments={
+                    "x-message-ttl": int(settings.CONSUMER_RETRY_DELAY * 2**attempt * 1000),
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": self.queue_name,
+                },
+            )
+        await self.channel.declare_queue(self.dead_letter_queue_name)
+
+    async def route(self, message: AbstractIncomingMessage, error: Exception):
+        reason = failure_reason(error)
+        FAILURES.labels(reason).inc()
+        attempt = int((message.headers or {}).get(RETRY_HEADER, 0))
+
+        if reason == "leased":
+            routing_key = self.retry_queue_name(min(attempt, settings.CONSUMER_MAX_RETRIES - 1))
+        elif reason == "invalid" or attempt >= settings.CONSUMER_MAX_RETRIES:
+            routing_key = self.dead_letter_queue_name
+        else:
+            routing_key = self.retry_queue_name(attempt)
+
+        try:
+            await self.channel.default_exchange.publish(
+                Message(
+                    message.body,
+                    headers={**(message.headers or {}), RETRY_HEADER: attempt + 1, REASON_HEADER: reason},
+                    content_type=message.content_type,
+                    message_id=message.message_id,
+                    timestamp=message.timestamp,
+                    type=message.type,
+                ),
+                routing_key=routing_key,
+            )
+        except Exception:
+            logger.exception("Failed to move a message to %s, requeueing it", routing_key)
+            await message.nack(requeue=True)
+        else:
+            await message.ack()
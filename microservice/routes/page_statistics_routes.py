@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 
 from microservice.jwt_auth import has_access
 from microservice.models.page_statistics import error_response_model, response_model
-from microservice.services.page_service import retrieve_pages_statistics
+from microservice.services.page_service import retrieve_pages_statistics, retrieve_pages_statistics_batch
+from microservice.settings import settings
 
 router = APIRouter()
 
@@ -15,6 +16,19 @@ async def get_pages_statistics_data(user_id: int = Depends(has_access)):
     return response_model(pages_statistics, "Empty list returned")
 
 
+@router.get("/pages/statistics/batch/", response_description="Statistics of several pages retrieved")
+async def get_pages_statistics_batch_data(
+    ids: list[int] = Query(..., max_items=settings.STATISTICS_BATCH_MAX_PAGES),
+    user_id: int = Depends(has_access),
+):
+    pages_statistics = await retrieve_pages_statistics_batch(user_id, ids)
+    if pages_statistics['UnprocessedPages']:
+        return response_model(
+            pages_statistics, "Pages statistics data partially retrieved, retry the unprocessed pages"
+        )
+    return response_model(pages_statistics, "Pages statistics data retrieved successfully")
+
+
 @router.get(
     "/pages/statistics/{page_id}/",
     response_description="Page statistics data retrieved",
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # So that a load whose callers were all cancelled doesn't log "exception was never retrieved".
+    if not task.cancelled():
+        task.exception()
+
+
+class StatisticsCache:
+    """In-process read-through cache with a TTL, an LRU size bound and single-flight loading.
+
+    Concurrent get_or_load() calls for the same key share one loader call. Entries are indexed by the page ids
+    they contain so that invalidate_page() drops every cached response a page update makes stale.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._keys_by_page = defaultdict(set)
+        self._in_flight = {}
+        # Page ids and keys invalidated while a load is in flight, whose result may then be stale.
+        self._stale_pages = {}
+        self._stale_keys = set()
+
+    async def get_or_load(self, key, loader, page_ids):
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value, _ = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return value
+            self._pop(key)
+
+        load = self._in_flight.get(key)
+        if load is None:
+            # The load runs in its own task, so a cancelled caller cancels neither it nor the other callers.
+            load = asyncio.ensure_future(self._load(key, loader, page_ids))
+            load.add_done_callback(_retrieve_exception)
+            self._in_flight[key] = load
+            self._stale_pages[key] = set()
+        return await asyncio.shield(load)
+
+    async def _load(self, key, loader, page_ids):
+        try:
+            value = await loader()
+            # A page invalidated while loading may have been read before its update, so don't keep the result.
+            value_page_ids = page_ids(value)
+            if key not in self._stale_keys and self._stale_pages[key].isdisjoint(value_page_ids):
+                self._store(key, value, value_page_ids)
+            return value
+        finally:
+            del self._in_flight[key]
+            del self._stale_pages[key]
+            self._stale_keys.discard(key)
+
+    def invalidate(self, key):
+        if key in self._in_flight:
+            self._stale_keys.add(key)
+        self._pop(key)
+
+    def invalidate_page(self, page_id: int):
+        for stale_pages in self._stale_pages.values():
+            stale_pages.add(page_id)
+        for key in list(self._keys_by_page.get(page_id, ())):
+            self._pop(key)
+
+    def _store(self, key, value, page_ids):
+        self._pop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, page_ids)
+        for page_id in page_ids:
+            self._keys_by_page[page_id].add(key)
+        while len(self._entries) > self.maxsize:
+            self._pop(next(iter(self._entries)))
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for page_id in entry[2]:
+            keys = self._keys_by_page.get(page_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_page[page_id]
@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict
+from enum import Enum
+
+import botocore.exceptions
+
+from microservice.services.dynamodb import dynamodb
+from microservice.settings import settings
+
+
+class Claim(str, Enum):
+    CLAIMED = "claimed"
+    LEASED = "leased"
+    DONE = "done"
+
+
+class EventLeased(Exception):
+    """The event is being processed by another consumer, whose lease has not expired yet"""
+
+
+class DedupStore:
+    """Remembers the ids of processed events for `ttl` seconds.
+
+    Recent ids are kept in a bounded in-memory LRU. Across restarts and consumer replicas an id is claimed with a
+    conditional put to the dedup table, whose items DynamoDB expires through the expires_at TTL attribute. A claim
+    stays in the "leased" state for only `lease` seconds until its event is completed and becomes "done", so that
+    the redelivery of an event whose consumer died before saving its writes can take it over.
+    """
+
+    def __init__(self, ttl: int, lease: int, maxsize: int):
+        self.ttl = ttl
+        self.lease = lease
+        self.maxsize = maxsize
+        self._seen = OrderedDict()
+
+    async def claim(self, event_id: str) -> Claim:
+        """Leases the event to the caller, unless it is done or leased to another consumer"""
+        now = time.time()
+        expires_at = self._seen.get(event_id)
+        if expires_at is not None and expires_at > now:
+            return Claim.DONE
+
+        try:
+            await dynamodb.dedup_table.put_item(
+                Item={'event_id': event_id, 'state': Claim.LEASED.value, 'expires_at': int(now + self.lease)},
+                ConditionExpression='attribute_not_exists(event_id) OR expires_at < :now',
+                ExpressionAttributeValues={':now': int(now)},
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return await self._claim_state(event_id)
+        return Claim.CLAIMED
+
+    async def _claim_state(self, event_id: str) -> Claim:
+        response = await dynamodb.dedup_table.get_item(Key={'event_id': event_id}, ConsistentRead=True)
+        item = response.get('Item')
+        # A missing item was released or expired since the put, its redelivery will claim it again.
+        if item is None or item.get('state') == Claim.LEASED.value:
+            return Claim.LEASED
+        # Items written before claims had states are done.
+        self._remember(event_id, float(item['expires_at']))
+        return Claim.DONE
+
+    async def complete(self, event_id: str):
+        """Marks a claimed event done and keeps it for the full ttl once its writes are saved"""
+        expires_at = time.time() + self.ttl
+        await dynamodb.dedup_table.update_item(
+            Key={'event_id': event_id},
+            UpdateExpression='SET #state = :state, expires_at = :expires_at',
+            ExpressionAttributeNames={'#state': 'state'},
+            ExpressionAttributeValues={':state': Claim.DONE.value, ':expires_at': int(expires_at)},
+        )
+        self._remember(event_id, expires_at)
+
+    async def release(self, event_id: str):
+        """Forgets a claimed event whose processing failed, so that its redelivery is processed again"""
+        self._seen.pop(event_id, None)
+        await dynamodb.dedup_table.delete_item(Key={'event_id': event_id})
+
+    def _remember(self, event_id: str, expires_at: float):
+        self._seen[event_id] = expires_at
+        self._seen.move_to_end(event_id)
+        while len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+
+
+dedup_store = DedupStore(settings.DEDUP_TTL, settings.DEDUP_LEASE, settings.DEDUP_CACHE_MAX_SIZE)
@@ -0,0 +1,66 @@
+import time
+from contextlib import AsyncExitStack
+
+import aioboto3
+from aiobotocore.config import AioConfig
+
+from microservice.metrics import DYNAMODB_LATENCY
+from microservice.settings import settings
+
+
+def _start_timer(context, **kwargs):
+    context["metrics_started_at"] = time.monotonic()
+
+
+def _observe_latency(event_name, context, **kwargs):
+    started_at = context.get("metrics_started_at")
+    if started_at is not None:
+        operation = event_name.rsplit(".", 1)[-1]
+        DYNAMODB_LATENCY.labels(operation).observe(time.monotonic() - started_at)
+
+
+class DynamoDBManager:
+    """Process-wide DynamoDB resource, opened once at startup and shared by the routes and the consumer"""
+
+    def __init__(self):
+        self._exit_stack = None
+        self.resource = None
+        self.table = None
+        self.dedup_table = None
+
+    async def open(self):
+        if self.resource is not None:
+            return
+
+        config = AioConfig(
+            max_pool_connections=settings.DYNAMODB_MAX_POOL_CONNECTIONS,
+            connector_args={"keepalive_timeout": settings.DYNAMODB_KEEPALIVE_TIMEOUT},
+        )
+        self._exit_stack = AsyncExitStack()
+        self.resource = await self._exit_stack.enter_async_context(
+            aioboto3.Session().resource(
+                "dynamodb",
+                endpoint_url=settings.AWS_URL,
+                region_name=settings.AWS_DEFAULT_REGION,
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                config=config,
+            )
+        )
+        events = self.resource.meta.client.meta.events
+        events.register("before-call.dynamodb", _start_timer)
+        events.register("after-call.dynamodb", _observe_latency)
+        events.register("after-call-error.dynamodb", _observe_latency)
+        self.table = await self.resource.Table(settings.AWS_DYNAMODB_TABLE_NAME)
+        self.dedup_table = await self.resource.Table(settings.AWS_DYNAMODB_DEDUP_TABLE_NAME)
+
+    async def close(self):
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+        self._exit_stack = None
+        self.resource = None
+        self.table = None
+        self.dedup_table = None
+
+
+dynamodb = DynamoDBManager()
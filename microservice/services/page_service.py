@@ -1,10 +1,14 @@
+import asyncio
+import logging
+from collections import Counter
 from enum import Enum
 
-import aioboto3
 import botocore.exceptions
 from boto3.dynamodb.conditions import Attr, Key
 
 from microservice.models.page_statistics import Page
+from microservice.services.cache import StatisticsCache
+from microservice.services.dynamodb import dynamodb
 from microservice.settings import settings
 
 
@@ -24,153 +28,314 @@ class CommandTypes(str, Enum):
     ADD_ALL_FOLLOWERS = "follower_added_all"
 
 
+USER_INDEX = {
+    'IndexName': settings.AWS_DYNAMODB_USER_INDEX_NAME,
+    'KeySchema': [
+        {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+        {'AttributeName': 'page_id', 'KeyType': 'RANGE'},
+    ],
+    'Projection': {'ProjectionType': 'ALL'},
+    'ProvisionedThroughput': {'ReadCapacityUnits': 10, 'WriteCapacityUnits': 10},
+}
+ATTRIBUTE_DEFINITIONS = [
+    {'AttributeName': 'page_id', 'AttributeType': 'N'},
+    {'AttributeName': 'user_id', 'AttributeType': 'N'},
+]
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_ATTEMPTS = 5
+BATCH_GET_BACKOFF = 0.05
+
+logger = logging.getLogger(__name__)
+
+statistics_cache = StatisticsCache(settings.STATISTICS_CACHE_TTL, settings.STATISTICS_CACHE_MAX_SIZE)
+
+
 async def create_table():
-    session = aioboto3.Session()
-    async with session.resource(
-        "dynamodb",
-        endpoint_url=settings.AWS_URL,
-        region_name=settings.AWS_DEFAULT_REGION,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    ) as dynamodb:
-        try:
-            await dynamodb.create_table(
-                TableName=settings.AWS_DYNAMODB_TABLE_NAME,
-                KeySchema=[
-                    {'AttributeName': 'page_id', 'KeyType': 'HASH'},
-                ],
-                AttributeDefinitions=[
-                    {'AttributeName': 'page_id', 'AttributeType': 'N'},
-                ],
-                ProvisionedThroughput={'ReadCapacityUnits': 10, 'WriteCapacityUnits': 10},
-            )
-        except botocore.exceptions.ClientError:
-            pass
+    try:
+        await dynamodb.resource.create_table(
+            TableName=settings.AWS_DYNAMODB_TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'page_id', 'KeyType': 'HASH'},
+            ],
+            AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+            GlobalSecondaryIndexes=[USER_INDEX],
+            ProvisionedThroughput={'ReadCapacityUnits': 10, 'WriteCapacityUnits': 10},
+        )
+    except botocore.exceptions.ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceInUseException':
+            await create_user_index()
+
+
+async def create_dedup_table():
+    try:
+        await dynamodb.resource.create_table(
+            TableName=settings.AWS_DYNAMODB_DEDUP_TABLE_NAME,
+            KeySchema=[{'AttributeName': 'event_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'event_id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+    except botocore.exceptions.ClientError:
+        return
+
+    client = dynamodb.resource.meta.client
+    await client.get_waiter('table_exists').wait(TableName=settings.AWS_DYNAMODB_DEDUP_TABLE_NAME)
+    await client.update_time_to_live(
+        TableName=settings.AWS_DYNAMODB_DEDUP_TABLE_NAME,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'},
+    )
+
+
+async def create_user_index():
+    """Adds the user_id index to a table created before it existed. DynamoDB backfills it in the background"""
+    client = dynamodb.resource.meta.client
+    description = await client.describe_table(TableName=settings.AWS_DYNAMODB_TABLE_NAME)
+    indexes = description['Table'].get('GlobalSecondaryIndexes', [])
+    if any(index['IndexName'] == USER_INDEX['IndexName'] for index in indexes):
+        return
+
+    await client.update_table(
+        TableName=settings.AWS_DYNAMODB_TABLE_NAME,
+        AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+        GlobalSecondaryIndexUpdates=[{'Create': USER_INDEX}],
+    )
 
 
 async def page_statistics_data(content_type: str, data):
     match content_type:
         case CommandTypes.CREATE_PAGE:
-            await create_new_page(Page.parse_obj(data))
+            page = Page.parse_obj(data)
+            await create_new_page(page)
+            statistics_cache.invalidate((page.owner, None))
+            # Drops a 404 cached for the page before it was created.
+            statistics_cache.invalidate_page(page.id)
         case CommandTypes.UPDATE_PAGE:
-            await update_page(Page.parse_obj(data))
+            page = Page.parse_obj(data)
+            await update_page(page)
+            statistics_cache.invalidate_page(page.id)
         case CommandTypes.DELETE_PAGE:
             await delete_page(int(data))
+            statistics_cache.invalidate_page(int(data))
 
 
 async def create_new_page(page):
-    session = aioboto3.Session()
-    async with session.resource(
-        "dynamodb",
-        endpoint_url=settings.AWS_URL,
-        region_name=settings.AWS_DEFAULT_REGION,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    ) as dynamo_resource:
-        table = await dynamo_resource.Table(settings.AWS_DYNAMODB_TABLE_NAME)
-        await table.put_item(
-            Item={
-                "page_id": page.id,
-                "user_id": page.owner,
-                "name": page.name,
-                "description": page.description,
-                "counters": {"amount_of_posts": 0, "amount_of_likes": 0, "amount_of_followers": 0},
-            }
-        )
+    await dynamodb.table.put_item(
+        Item={
+            "page_id": page.id,
+            "user_id": page.owner,
+            "name": page.name,
+            "description": page.description,
+            "counters": {"amount_of_posts": 0, "amount_of_likes": 0, "amount_of_followers": 0},
+        }
+    )
 
 
 async def update_page(page):
-    session = aioboto3.Session()
-    async with session.resource(
-        "dynamodb",
-        endpoint_url=settings.AWS_URL,
-        region_name=settings.AWS_DEFAULT_REGION,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    ) as dynamo_resource:
-        table = await dynamo_resource.Table(settings.AWS_DYNAMODB_TABLE_NAME)
-        table.update_item(
-            Key={'page_id': page.id},
-            UpdateExpression="SET name = :n, description = :d",
-            ExpressionAttributeValues={":n": page.name, ":d": page.description},
-        )
+    await dynamodb.table.update_item(
+        Key={'page_id': page.id},
+        UpdateExpression="SET #n = :n, description = :d",
+        ExpressionAttributeNames={"#n": "name"},
+        ExpressionAttributeValues={":n": page.name, ":d": page.description},
+    )
 
 
 async def delete_page(page_id):
-    session = aioboto3.Session()
-    async with session.resource(
-        "dynamodb",
-        endpoint_url=settings.AWS_URL,
-        region_name=settings.AWS_DEFAULT_REGION,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    ) as dynamo_resource:
-        table = await dynamo_resource.Table(settings.AWS_DYNAMODB_TABLE_NAME)
-        table.delete_item(Key={'page_id': page_id})
-
-
-async def update_posts_counter(page_id: int, field):
+    await dynamodb.table.delete_item(Key={'page_id': page_id})
+
+
+class CounterAggregator:
+    """Coalesces counter deltas per page and writes them with one UpdateItem per page.
+
+    Deltas are buffered for up to `window` seconds or until `max_batch` of them are pending.
+    Every add() returns a future that is resolved once that delta has been written, or fails with the write's error.
+    flush() returns only once the writes of the flushes started before it are done too.
+    """
+
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}
+        self._size = 0
+        self._timer = None
+        self._flushes = set()
+        self._writes = set()
+
+    def add(self, page_id: int, counter: str, delta: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        deltas, waiters = self._pending.setdefault(page_id, (Counter(), []))
+        deltas[counter] += delta
+        waiter = loop.create_future()
+        waiters.append(waiter)
+        self._size += 1
+
+        if self._size >= self.max_batch:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._schedule_flush)
+        return waiter
+
+    def _schedule_flush(self):
+        # Keeps a reference so the task is not garbage collected mid-flush, and surfaces its errors.
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task):
+        self._flushes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Failed to flush counter deltas", exc_info=task.exception())
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._size = self._pending, {}, 0
+        earlier_writes = list(self._writes)
+
+        page_ids = list(pending)
+        writes = asyncio.gather(
+            *(update_page_statistics(page_id, pending[page_id][0]) for page_id in page_ids),
+            return_exceptions=True,
+        )
+        self._writes.add(writes)
+        try:
+            results = await writes
+        finally:
+            self._writes.discard(writes)
+        for page_id, result in zip(page_ids, results):
+            statistics_cache.invalidate_page(page_id)
+            for waiter in pending[page_id][1]:
+                if waiter.done():
+                    continue
+                if isinstance(result, BaseException):
+                    waiter.set_exception(result)
+                else:
+                    waiter.set_result(None)
+
+        # Writes that follow a flush, e.g. of a page, must not overtake deltas a timer flush is still writing.
+        if earlier_writes:
+            await asyncio.wait(earlier_writes)
+
+
+counter_aggregator = CounterAggregator(settings.STATISTICS_FLUSH_INTERVAL, settings.STATISTICS_MAX_BATCH_SIZE)
+
+
+def update_posts_counter(page_id: int, field) -> asyncio.Future:
     match field:
         case CommandTypes.CREATE_POST:
-            await update_page_statistics(page_id, 'amount_of_posts')
+            return counter_aggregator.add(page_id, 'amount_of_posts', 1)
         case CommandTypes.DELETE_POST:
-            await update_page_statistics(page_id, 'amount_of_posts', False)
+            return counter_aggregator.add(page_id, 'amount_of_posts', -1)
 
 
-async def update_likes_counter(page_id: int, field):
+def update_likes_counter(page_id: int, field) -> asyncio.Future:
     match field:
         case CommandTypes.CREATE_LIKE:
-            await update_page_statistics(page_id, 'amount_of_likes')
+            return counter_aggregator.add(page_id, 'amount_of_likes', 1)
         case CommandTypes.DELETE_LIKE:
-            await update_page_statistics(page_id, 'amount_of_likes', False)
+            return counter_aggregator.add(page_id, 'amount_of_likes', -1)
 
 
-async def update_followers_counter(data, field):
+def update_followers_counter(data, field) -> asyncio.Future:
     match field:
         case CommandTypes.ADD_FOLLOWER:
-            await update_page_statistics(int(data), 'amount_of_followers')
+            return counter_aggregator.add(int(data), 'amount_of_followers', 1)
         case CommandTypes.ADD_ALL_FOLLOWERS:
-            await update_page_statistics(int(data['page_id']), 'amount_of_followers', True, int(data["quantity"]))
+            return counter_aggregator.add(int(data['page_id']), 'amount_of_followers', int(data["quantity"]))
         case CommandTypes.DELETE_FOLLOWER:
-            await update_page_statistics(int(data), 'amount_of_followers', False)
-
-
-async def update_page_statistics(page_id: int, value, increase=True, quantity: int = 0):
-    session = aioboto3.Session()
-    async with session.resource(
-        "dynamodb",
-        endpoint_url=settings.AWS_URL,
-        region_name=settings.AWS_DEFAULT_REGION,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    ) as dynamo_resource:
-        table = await dynamo_resource.Table(settings.AWS_DYNAMODB_TABLE_NAME)
-        if quantity == 0:
-            number = 1
-        else:
-            number = quantity
-        await table.update_item(
-            Key={'page_id': page_id},
-            UpdateExpression=f"ADD counters.{value} :value",
-            ExpressionAttributeValues={":value": number if increase else -1},
-        )
+            return counter_aggregator.add(int(data), 'amount_of_followers', -1)
+
+
+async def update_page_statistics(page_id: int, counters: dict):
+    counters = {counter: delta for counter, delta in counters.items() if delta}
+    if not counters:
+        return
+
+    await dynamodb.table.update_item(
+        Key={'page_id': page_id},
+        UpdateExpression="ADD " + ", ".join(f"counters.{counter} :{counter}" for counter in counters),
+        ExpressionAttributeValues={f":{counter}": delta for counter, delta in counters.items()},
+    )
+
+
+async def query_user_pages(user_id: int) -> list:
+    kwargs = {
+        'IndexName': settings.AWS_DYNAMODB_USER_INDEX_NAME,
+        'KeyConditionExpression': Key('user_id').eq(user_id),
+    }
+    try:
+        return await _read_all_pages(dynamodb.table.query, **kwargs)
+    except botocore.exceptions.ClientError as e:
+        if not _is_user_index_unavailable(e):
+            raise
+        # The index is missing or still being backfilled on a table that existed before it was added.
+        return await _read_all_pages(dynamodb.table.scan, FilterExpression=Attr("user_id").eq(user_id))
+
+
+def _is_user_index_unavailable(error: botocore.exceptions.ClientError) -> bool:
+    if error.response['Error']['Code'] != 'ValidationException':
+        return False
+    message = error.response['Error'].get('Message', '').lower()
+    return 'backfilling' in message or 'does not have the specified index' in message
+
+
+async def _read_all_pages(operation, **kwargs) -> list:
+    items = []
+    while True:
+        response = await operation(**kwargs)
+        items.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
 
 async def retrieve_pages_statistics(user_id, page_id=None):
-    session = aioboto3.Session()
-    async with session.resource(
-        "dynamodb",
-        endpoint_url=settings.AWS_URL,
-        region_name=settings.AWS_DEFAULT_REGION,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    ) as dynamo_resource:
-        table = await dynamo_resource.Table(settings.AWS_DYNAMODB_TABLE_NAME)
-        if not page_id:
-            return await table.scan(FilterExpression=Attr("user_id").eq(user_id))
-        response = await table.query(
-            KeyConditionExpression=Key('page_id').eq(page_id), FilterExpression=Attr('user_id').eq(user_id)
-        )
-        if not response['Items']:
-            return 404
-        return response
+    return await statistics_cache.get_or_load(
+        (user_id, page_id),
+        lambda: _load_pages_statistics(user_id, page_id),
+        lambda response: {page_id} if page_id else {int(item['page_id']) for item in response['Items']},
+    )
+
+
+async def _load_pages_statistics(user_id, page_id=None):
+    if not page_id:
+        items = await query_user_pages(user_id)
+        return {'Items': items, 'Count': len(items)}
+    response = await dynamodb.table.query(
+        KeyConditionExpression=Key('page_id').eq(page_id), FilterExpression=Attr('user_id').eq(user_id)
+    )
+    if not response['Items']:
+        return 404
+    return response
+
+
+async def retrieve_pages_statistics_batch(user_id, page_ids: list) -> dict:
+    """Fetches the statistics of the given pages with parallel BatchGetItem calls, keeping only the user's pages.
+
+    Pages DynamoDB still left unprocessed after the retries are listed under 'UnprocessedPages' instead of failing
+    the whole batch.
+    """
+    page_ids = list(dict.fromkeys(page_ids))
+    starts = range(0, len(page_ids), BATCH_GET_MAX_KEYS)
+    chunks = [page_ids[slice(start, start + BATCH_GET_MAX_KEYS)] for start in starts]
+    responses = await asyncio.gather(*(_batch_get_pages(chunk) for chunk in chunks))
+    items = [item for found, _ in responses for item in found if item.get('user_id') == user_id]
+    unprocessed = [page_id for _, pending in responses for page_id in pending]
+    return {'Items': items, 'Count': len(items), 'UnprocessedPages': unprocessed}
+
+
+async def _batch_get_pages(page_ids: list) -> tuple:
+    """Returns the items found and the ids of the pages that stayed unprocessed"""
+    table_name = settings.AWS_DYNAMODB_TABLE_NAME
+    request_items = {table_name: {'Keys': [{'page_id': page_id} for page_id in page_ids]}}
+    items = []
+    for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(BATCH_GET_BACKOFF * 2 ** (attempt - 1))
+        response = await dynamodb.resource.batch_get_item(RequestItems=request_items)
+        items.extend(response['Responses'].get(table_name, []))
+        request_items = response.get('UnprocessedKeys')
+        if not request_items:
+            return items, []
+    unprocessed = [int(key['page_id']) for key in request_items[table_name]['Keys']]
+    logger.warning("%d pages stayed unprocessed", len(unprocessed))
+    return items, unprocessed
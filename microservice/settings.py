@@ -7,11 +7,27 @@ class Settings(BaseSettings):
     RABBITMQ_HOST: str
     RABBITMQ_PORT: int
     RABBIT_QUEUE_NAME: str
+    RABBIT_PREFETCH_COUNT: int = 100
+    CONSUMER_LANES: int = 8
+    CONSUMER_MAX_RETRIES: int = 5
+    CONSUMER_RETRY_DELAY: float = 1
+    STATISTICS_FLUSH_INTERVAL: float = 0.05
+    STATISTICS_MAX_BATCH_SIZE: int = 500
     AWS_URL: str
     AWS_DEFAULT_REGION: str
     AWS_ACCESS_KEY_ID: str
     AWS_SECRET_ACCESS_KEY: str
     AWS_DYNAMODB_TABLE_NAME: str
+    AWS_DYNAMODB_USER_INDEX_NAME: str = "user_id-index"
+    AWS_DYNAMODB_DEDUP_TABLE_NAME: str = "processed_events"
+    DEDUP_TTL: int = 24 * 60 * 60
+    DEDUP_LEASE: int = 60
+    DEDUP_CACHE_MAX_SIZE: int = 100000
+    STATISTICS_BATCH_MAX_PAGES: int = 500
+    STATISTICS_CACHE_TTL: float = 5
+    STATISTICS_CACHE_MAX_SIZE: int = 10000
+    DYNAMODB_MAX_POOL_CONNECTIONS: int = 50
+    DYNAMODB_KEEPALIVE_TIMEOUT: float = 60
     SECRET_KEY: str
 
     class Config:
@@ -0,0 +1,95 @@
+import asyncio
+
+import botocore.exceptions
+import pytest
+
+from microservice import consumer
+from microservice.services import page_service
+from microservice.services.page_service import CommandTypes, CounterAggregator
+
+
+@pytest.fixture()
+def aggregator(mocker):
+    aggregator = CounterAggregator(window=0.01, max_batch=100)
+    mocker.patch("microservice.services.page_service.counter_aggregator", aggregator)
+    mocker.patch("microservice.consumer.counter_aggregator", aggregator)
+    return aggregator
+
+
+class TestCounterAggregator:
+    def test_coalesces_deltas_into_one_write_per_page(self, tables, aggregator):
+        statistics_table, _ = tables
+
+        async def scenario():
+            await asyncio.gather(
+                aggregator.add(1, "amount_of_likes", 1),
+                aggregator.add(1, "amount_of_likes", 1),
+                aggregator.add(1, "amount_of_posts", -1),
+                aggregator.add(2, "amount_of_likes", 1),
+            )
+
+        asyncio.run(scenario())
+
+        assert statistics_table.calls["update_item"] == 2
+        assert statistics_table.items[1]["counters"] == {"amount_of_likes": 2, "amount_of_posts": -1}
+        assert statistics_table.items[2]["counters"] == {"amount_of_likes": 1}
+
+    def test_flushes_when_the_batch_is_full(self, tables, aggregator):
+        statistics_table, _ = tables
+        aggregator.window = 60
+        aggregator.max_batch = 2
+
+        async def scenario():
+            await asyncio.wait_for(
+                asyncio.gather(aggregator.add(1, "amount_of_likes", 1), aggregator.add(2, "amount_of_likes", 1)), 1
+            )
+
+        asyncio.run(scenario())
+
+        assert statistics_table.calls["update_item"] == 2
+
+    def test_write_errors_fail_the_waiters_of_that_page(self, tables, aggregator, mocker):
+        error = botocore.exceptions.ClientError({"Error": {"Code": "ThrottlingException"}}, "UpdateItem")
+        update = page_service.update_page_statistics
+
+        async def update_page_statistics(page_id, counters):
+            if page_id == 1:
+                raise error
+            await update(page_id, counters)
+
+        mocker.patch("microservice.services.page_service.update_page_statistics", update_page_statistics)
+
+        async def scenario():
+            return await asyncio.gather(
+                aggregator.add(1, "amount_of_likes", 1), aggregator.add(2, "amount_of_likes", 1), return_exceptions=True
+            )
+
+        assert asyncio.run(scenario()) == [error, None]
+
+    def test_page_writes_wait_for_running_counter_writes(self, tables, aggregator, mocker):
+        order = []
+        update = page_service.update_page_statistics
+
+        async def slow_update_page_statistics(page_id, counters):
+            order.append("counters started")
+            await asyncio.sleep(0.05)
+            await update(page_id, counters)
+            order.append("counters written")
+
+        async def delete_page(page_id):
+            order.append("page deleted")
+
+        mocker.patch("microservice.services.page_service.update_page_statistics", slow_update_page_statistics)
+        mocker.patch("microservice.services.page_service.delete_page", delete_page)
+
+        async def scenario():
+            saved = aggregator.add(1, "amount_of_likes", 1)
+            # Let the timer start its flush, then delete the page while the counter write is running.
+            while order != ["counters started"]:
+                await asyncio.sleep(0.005)
+            await consumer.handle_page_event(CommandTypes.DELETE_PAGE, 1)
+            await saved
+
+        asyncio.run(scenario())
+
+        assert order == ["counters started", "counters written", "page deleted"]
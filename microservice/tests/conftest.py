@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+# The service reads its required settings from the environment when it is imported.
+for name, value in {
+    "RABBITMQ_USER": "guest",
+    "RABBITMQ_PASS": "guest",
+    "RABBITMQ_HOST": "localhost",
+    "RABBITMQ_PORT": "5672",
+    "RABBIT_QUEUE_NAME": "statistics",
+    "AWS_URL": "http://localhost:4566",
+    "AWS_DEFAULT_REGION": "us-west-2",
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "AWS_DYNAMODB_TABLE_NAME": "pages",
+    "SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+from microservice.benchmark.stubs import MemoryTable  # noqa: E402
+from microservice.services.dynamodb import dynamodb  # noqa: E402
+
+
+@pytest.fixture()
+def tables():
+    """Swaps the DynamoDB tables for in-memory ones, returns (statistics table, dedup table)"""
+    saved = dynamodb.table, dynamodb.dedup_table
+    dynamodb.table, dynamodb.dedup_table = MemoryTable("page_id"), MemoryTable("event_id")
+    yield dynamodb.table, dynamodb.dedup_table
+    dynamodb.table, dynamodb.dedup_table = saved
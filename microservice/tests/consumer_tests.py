@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import msgpack
+import pytest
+
+from microservice import consumer
+from microservice.benchmark.stubs import MemoryChannel, MemoryMessage, MemoryQueue
+from microservice.retry import REASON_HEADER, RETRY_HEADER, RetryRouter
+from microservice.services.dedup import Claim, DedupStore
+from microservice.services.page_service import CounterAggregator
+
+
+@pytest.fixture()
+def dedup_store(mocker):
+    store = DedupStore(ttl=60, lease=5, maxsize=10)
+    mocker.patch("microservice.consumer.dedup_store", store)
+    return store
+
+
+@pytest.fixture()
+def aggregator(mocker):
+    aggregator = CounterAggregator(window=0.01, max_batch=100)
+    mocker.patch("microservice.services.page_service.counter_aggregator", aggregator)
+    mocker.patch("microservice.consumer.counter_aggregator", aggregator)
+    return aggregator
+
+
+def like_message(event_id: str, page_id: int) -> MemoryMessage:
+    body = msgpack.packb({"id": event_id, "type": "like_created", "v": consumer.EVENT_VERSION, "data": page_id})
+    return MemoryMessage(body, consumer.EVENT_CONTENT_TYPE, event_id, "like_created", on_settle=lambda: None)
+
+
+def run_lane(channel: MemoryChannel, *messages: MemoryMessage):
+    async def scenario():
+        lane, settling = asyncio.Queue(), set()
+        for message in messages:
+            event_id, event_type, data = consumer.decode_message(message)
+            lane.put_nowait((message, event_id, event_type, data, time.monotonic()))
+        worker = asyncio.create_task(consumer.process_lane(lane, settling, RetryRouter(channel, "statistics")))
+        await lane.join()
+        await asyncio.gather(*settling)
+        worker.cancel()
+
+    asyncio.run(scenario())
+
+
+class TestProcessLane:
+    def test_processes_and_completes_a_new_event(self, tables, dedup_store, aggregator):
+        statistics_table, dedup_table = tables
+        message = like_message("a", 1)
+
+        run_lane(MemoryChannel(MemoryQueue("statistics")), message)
+
+        assert message.acked
+        assert statistics_table.items[1]["counters"]["amount_of_likes"] == 1
+        assert dedup_table.items["a"]["state"] == Claim.DONE.value
+
+    def test_acks_a_done_event_as_duplicate(self, tables, dedup_store, aggregator):
+        statistics_table, dedup_table = tables
+        dedup_table.items["a"] = {"event_id": "a", "state": Claim.DONE.value, "expires_at": int(time.time()) + 60}
+        channel = MemoryChannel(MemoryQueue("statistics"))
+        message = like_message("a", 1)
+
+        run_lane(channel, message)
+
+        assert message.acked
+        assert not channel.republished
+        assert 1 not in statistics_table.items
+
+    def test_retries_an_event_leased_to_another_consumer(self, tables, dedup_store, aggregator):
+        statistics_table, dedup_table = tables
+        dedup_table.items["a"] = {"event_id": "a", "state": Claim.LEASED.value, "expires_at": int(time.time()) + 60}
+        channel = MemoryChannel(MemoryQueue("statistics"))
+
+        run_lane(channel, like_message("a", 1))
+
+        [(routing_key, message)] = channel.republished
+        assert routing_key == "statistics.retry.0"
+        assert message.headers[REASON_HEADER] == "leased"
+        assert 1 not in statistics_table.items
+        # The lease of the other consumer is left alone.
+        assert dedup_table.items["a"]["state"] == Claim.LEASED.value
+
+    def test_leased_events_are_never_dead_lettered(self, tables, dedup_store, aggregator, mocker):
+        mocker.patch("microservice.retry.settings.CONSUMER_MAX_RETRIES", 2)
+        _, dedup_table = tables
+        dedup_table.items["a"] = {"event_id": "a", "state": Claim.LEASED.value, "expires_at": int(time.time()) + 60}
+        channel = MemoryChannel(MemoryQueue("statistics"))
+        message = like_message("a", 1)
+        message.headers = {RETRY_HEADER: 7}
+
+        run_lane(channel, message)
+
+        assert [routing_key for routing_key, _ in channel.republished] == ["statistics.retry.1"]
@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from microservice.services.dedup import Claim, DedupStore
+
+
+def test_claims_an_event_once_it_is_done(tables):
+    _, dedup_table = tables
+    store = DedupStore(ttl=60, lease=5, maxsize=10)
+
+    async def scenario():
+        assert await store.claim("a") is Claim.CLAIMED
+        assert await store.claim("a") is Claim.LEASED
+        await store.complete("a")
+        assert await DedupStore(ttl=60, lease=5, maxsize=10).claim("a") is Claim.DONE
+
+    asyncio.run(scenario())
+    assert dedup_table.items["a"]["state"] == Claim.DONE.value
+
+
+def test_expired_lease_is_taken_over(tables):
+    _, dedup_table = tables
+    dedup_table.items["a"] = {"event_id": "a", "state": Claim.LEASED.value, "expires_at": int(time.time()) - 1}
+
+    assert asyncio.run(DedupStore(ttl=60, lease=5, maxsize=10).claim("a")) is Claim.CLAIMED
+
+
+def test_released_event_is_claimed_again(tables):
+    store = DedupStore(ttl=60, lease=5, maxsize=10)
+
+    async def scenario():
+        await store.claim("a")
+        await store.release("a")
+        return await store.claim("a")
+
+    assert asyncio.run(scenario()) is Claim.CLAIMED
+
+
+def test_items_without_state_are_done(tables):
+    _, dedup_table = tables
+    dedup_table.items["a"] = {"event_id": "a", "expires_at": int(time.time()) + 60}
+
+    assert asyncio.run(DedupStore(ttl=60, lease=5, maxsize=10).claim("a")) is Claim.DONE
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from microservice.services.cache import StatisticsCache
+from microservice.services.page_service import CommandTypes, page_statistics_data
+
+
+def page_ids(value) -> set:
+    return set(value)
+
+
+class Loader:
+    """Loader returning `value` once released, counting its calls"""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.released.wait()
+        return self.value
+
+
+class TestStatisticsCache:
+    def test_coalesces_concurrent_loads(self):
+        cache = StatisticsCache(ttl=60, maxsize=10)
+
+        async def scenario():
+            loader = Loader([1])
+            callers = [asyncio.ensure_future(cache.get_or_load("a", loader, page_ids)) for _ in range(3)]
+            await asyncio.sleep(0)
+            loader.released.set()
+            values = await asyncio.gather(*callers)
+            return loader.calls, values, await cache.get_or_load("a", Loader([2]), page_ids)
+
+        assert asyncio.run(scenario()) == (1, [[1], [1], [1]], [1])
+
+    def test_cancelled_caller_does_not_cancel_the_others(self):
+        cache = StatisticsCache(ttl=60, maxsize=10)
+
+        async def scenario():
+            loader = Loader([1])
+            first = asyncio.ensure_future(cache.get_or_load("a", loader, page_ids))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(cache.get_or_load("a", loader, page_ids))
+            await asyncio.sleep(0)
+            first.cancel()
+            loader.released.set()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await asyncio.wait_for(second, 1)
+
+        assert asyncio.run(scenario()) == [1]
+
+    def test_load_errors_reach_every_caller_and_are_not_cached(self):
+        cache = StatisticsCache(ttl=60, maxsize=10)
+
+        async def failing_loader():
+            await asyncio.sleep(0)
+            raise RuntimeError("unavailable")
+
+        async def scenario():
+            return await asyncio.gather(
+                cache.get_or_load("a", failing_loader, page_ids),
+                cache.get_or_load("a", failing_loader, page_ids),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(scenario())
+
+        assert [str(result) for result in results] == ["unavailable", "unavailable"]
+        assert "a" not in cache._entries
+
+    @pytest.mark.parametrize("invalidated_page, cached", [(1, False), (99, True)])
+    def test_invalidation_during_a_load(self, invalidated_page, cached):
+        cache = StatisticsCache(ttl=60, maxsize=10)
+
+        async def scenario():
+            loader = Loader([1, 2])
+            load = asyncio.ensure_future(cache.get_or_load("a", loader, page_ids))
+            await asyncio.sleep(0)
+            cache.invalidate_page(invalidated_page)
+            loader.released.set()
+            await load
+
+        asyncio.run(scenario())
+
+        assert ("a" in cache._entries) is cached
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = StatisticsCache(ttl=60, maxsize=2)
+
+        async def scenario():
+            for key in ("a", "b", "a", "c"):
+                loader = Loader([key])
+                loader.released.set()
+                await cache.get_or_load(key, loader, lambda value: set())
+
+        asyncio.run(scenario())
+
+        assert list(cache._entries) == ["a", "c"]
+
+    def test_page_creation_drops_its_cached_404(self, tables, mocker):
+        cache = mocker.patch("microservice.services.page_service.statistics_cache", StatisticsCache(ttl=60, maxsize=10))
+
+        async def scenario():
+            loader = Loader(404)
+            loader.released.set()
+            await cache.get_or_load((7, 1), loader, lambda response: {1})
+            await page_statistics_data(CommandTypes.CREATE_PAGE, {"id": 1, "owner": 7, "name": "Jazz"})
+
+        asyncio.run(scenario())
+
+        assert (7, 1) not in cache._entries